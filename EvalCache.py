@@ -0,0 +1,143 @@
+from Hoigi_Board import *
+from collections import OrderedDict
+
+# cache of position evaluations, keyed by the Zobrist hash of the pieces and the side to move
+# values are stored from white's point of view, so a position and its colour-flipped mirror image
+# (see MIRROR_KEYS in Hoigi_Board) can share one entry: the mirror has the negated value with the other side to move
+# sharing is only correct for an evaluation that is exactly colour-antisymmetric (the mirror image gets the negated
+# value), which board.score is and a trained network (NNUE, Keras) is not, so mirror = True is an explicit opt-in:
+# CachedEvaluator only accepts it for evaluators that declare mirror_symmetric = True, and
+# MinimaxAlphaBeta_Player does not accept it together with an NNUE network
+# move generation is not symmetric either, so move priors are only shared when every move maps across
+
+class EvalCache:
+    """ bounded table of evaluations with hit and miss counters
+        policy "lru" evicts the least recently used entry, "clock" the first entry the clock hand finds
+        that was not used since the hand last passed it (cheaper bookkeeping on every hit)
+        mirror = True stores a position and its mirror image under the same key, only for antisymmetric evaluations
+    """
+    def __init__(self, capacity = 65536, policy = "lru", mirror = False):
+        if (policy not in ("lru", "clock")):
+            raise ValueError("unknown eviction policy " + str(policy))
+        if (capacity < 1):
+            raise ValueError("an EvalCache holds at least one entry, leave it out to evaluate without a cache")
+        self.capacity = capacity
+        self.policy = policy
+        self.mirror = mirror
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def clear(self):
+        # forget every entry, the counters are kept
+        self.entries = OrderedDict() # key -> entry for lru, key -> slot for clock
+        self.slot_keys = [None] * self.capacity if self.policy == "clock" else []
+        self.slot_entries = [None] * self.capacity if self.policy == "clock" else []
+        self.used = bytearray(self.capacity) if self.policy == "clock" else bytearray()
+        self.hand = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, board, team):
+        # (key, sign) of the position on board with team to move
+        # sign is -1 when the key is the one of the mirror image, the white value of the entry is then negated
+        key = board.hash ^ (ZOBRIST_SIDE if board.turn == -1 else 0) ^ (ZOBRIST_SIDE if team == -1 else 0)
+        if (self.mirror):
+            mirror_key = board.mirror_hash ^ (ZOBRIST_SIDE if team == 1 else 0)
+            if (mirror_key < key):
+                return mirror_key, -1
+        return key, 1
+
+    def get(self, key):
+        # the entry stored under key, None if there is none
+        if (key not in self.entries):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if (self.policy == "lru"):
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        slot = self.entries[key]
+        self.used[slot] = 1
+        return self.slot_entries[slot]
+
+    def put(self, key, entry):
+        # store an entry, evicting another one when the cache is full
+        if (self.policy == "lru"):
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            if (len(self.entries) > self.capacity):
+                self.entries.popitem(last = False)
+            return
+        if (key in self.entries):
+            slot = self.entries[key]
+        else:
+            while (self.used[self.hand]): # give every recently used entry a second chance
+                self.used[self.hand] = 0
+                self.hand = (self.hand + 1) % self.capacity
+            slot = self.hand
+            self.hand = (self.hand + 1) % self.capacity
+            if (self.slot_keys[slot] != None):
+                del self.entries[self.slot_keys[slot]]
+            self.slot_keys[slot] = key
+            self.entries[key] = slot
+        self.slot_entries[slot] = entry
+        self.used[slot] = 1
+
+    def hitrate(self):
+        # fraction of lookups that found the position
+        if (self.hits + self.misses == 0):
+            return 0
+        return self.hits / (self.hits + self.misses)
+
+
+class CachedEvaluator:
+    # an MCTS_Player evaluator (see HeuristicEvaluator in Player) with an EvalCache in front of it
+    # the entry of a position is (white value, {move: prior}) with the moves as they are played in the stored orientation
+    # evaluate_batch sends only the positions it does not know to the evaluator, in one batch
+    # a mirror cache needs an evaluator with mirror_symmetric = True (see HeuristicEvaluator)
+    def __init__(self, evaluator, cache):
+        if (cache.mirror and not getattr(evaluator, "mirror_symmetric", False)):
+            raise ValueError(type(evaluator).__name__ + " is not colour-antisymmetric, it cannot share a mirror EvalCache")
+        self.evaluator = evaluator
+        self.cache = cache
+
+    def evaluate(self, board, moves, team):
+        return self.evaluate_batch([(board, moves, team)])[0]
+
+    def lookup(self, board, moves, team):
+        # (priors, value) from the cache, None if the position is not in it
+        key, sign = self.cache.key(board, team)
+        entry = self.cache.get(key)
+        if (entry == None):
+            return key, sign, None
+        value, priors = entry
+        if (sign == -1):
+            move_priors = [priors.get(mirror_move(m)) for m in moves]
+        else:
+            move_priors = [priors.get(m) for m in moves]
+        if (None in move_priors): # the moves do not map across the mirror, fall back to uniform priors
+            move_priors = uniform_priors(moves)
+        return key, sign, (move_priors, sign * value * team)
+
+    def evaluate_batch(self, positions):
+        results = [None] * len(positions)
+        missing = []
+        for i, (board, moves, team) in enumerate(positions):
+            key, sign, result = self.lookup(board, moves, team)
+            if (result == None):
+                missing.append((i, key, sign))
+            else:
+                results[i] = result
+        if (missing != []):
+            evaluated = self.evaluator.evaluate_batch([positions[i] for i, key, sign in missing])
+            for (i, key, sign), (priors, value) in zip(missing, evaluated):
+                board, moves, team = positions[i]
+                if (sign == -1):
+                    priors_of = {mirror_move(m): p for m, p in zip(moves, priors)}
+                else:
+                    priors_of = dict(zip(moves, priors))
+                self.cache.put(key, (sign * value * team, priors_of))
+                results[i] = (priors, value)
+        return results
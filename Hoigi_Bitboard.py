@@ -0,0 +1,176 @@
+from Hoigi_Board import *
+import random
+
+# bitboards: one 81-bit Python int per (team, type, tier), bit y * 9 + x is set when that piece stands there
+# tiers are the layers of the board, z = 2 is the bottom of a tower (layer 1) and z = 0 the top (layer 3)
+
+def target_mask_tables():
+    # MOVE_TARGETS as bit masks, index (team * type + 9) * 243 + cell like MOVE_TARGETS
+    # the second table marks targets that MOVE_TARGETS lists twice, those moves are generated twice as well
+    masks = [0] * (19 * 243)
+    twice = [0] * (19 * 243)
+    for i in range(19 * 243):
+        for ty, tx, base in MOVE_TARGETS[i]:
+            bit = 1 << (ty * 9 + tx)
+            if (masks[i] & bit):
+                twice[i] |= bit
+            masks[i] |= bit
+    return masks, twice
+
+TARGET_MASKS, TARGET_TWICE = target_mask_tables()
+ALL_SQUARES = (1 << 81) - 1
+
+
+class BitBoard(ArrayBoard):
+    """ game board for chess stored as bitboards, one mask per (team, type, tier)
+        occupancy, tower height and capture targets are found with bitwise operations on whole masks
+        the cell codes of ArrayBoard are kept next to the masks to answer "what stands on this cell",
+        everything that only reads or writes cells is inherited from ArrayBoard
+    """
+    def __init__(self, height, width, layers):
+        """ constructs a new board object
+        """
+        super().__init__(height, width, layers)
+        self.pieces = [0] * (19 * 3)  # mask of each (team, type, tier) at index (team * type + 9) * 3 + z
+        self.white = [0, 0, 0]        # all white pieces on each tier
+        self.black = [0, 0, 0]        # all black pieces on each tier
+
+    def copy_board(self):
+        """ create and return a copy of the board object
+        """
+        newboard = super().copy_board()
+        newboard.pieces = list(self.pieces)
+        newboard.white = list(self.white)
+        newboard.black = list(self.black)
+        return newboard
+
+    def place(self, i, code):
+        # put code (team * type, 0 for empty) in cell i, replacing whatever was there
+        # keeps the masks up to date, ArrayBoard.place does the cells, hash, score and piece counts
+        old = self.cells[i]
+        z = i % 3
+        bit = 1 << (i // 3)
+        if (old > 0):
+            self.pieces[(old + 9) * 3 + z] ^= bit
+            self.white[z] ^= bit
+        elif (old < 0):
+            self.pieces[(old + 9) * 3 + z] ^= bit
+            self.black[z] ^= bit
+        if (code > 0):
+            self.pieces[(code + 9) * 3 + z] |= bit
+            self.white[z] |= bit
+        elif (code < 0):
+            self.pieces[(code + 9) * 3 + z] |= bit
+            self.black[z] |= bit
+        super().place(i, code)
+
+    def check_winner(self):
+        # return an integer, 0 = no winner, -1 = black is winner, 1 = white is winner
+        return bin(self.pieces[(2 + 9) * 3 + 2]).count("1") - bin(self.pieces[(-2 + 9) * 3 + 2]).count("1")
+
+    def legal_codes(self, team, captures_only = False):
+        # legal moves of a team packed into integers, see encode_move
+        # the same moves as board.legal_moves, found tier by tier with masks
+        # captures_only = True leaves out the moves that capture nothing
+        if (team == 1):
+            own, enemy = self.white, self.black
+        else:
+            own, enemy = self.black, self.white
+        occ0 = own[0] | enemy[0]
+        occ1 = own[1] | enemy[1]
+        occ2 = own[2] | enemy[2]
+        kings = self.pieces[(2 + 9) * 3 + 2] | self.pieces[(-2 + 9) * 3 + 2]
+        # a piece can only move from the top of its tower
+        movable = [ALL_SQUARES, ALL_SQUARES & ~occ0, ALL_SQUARES & ~occ0 & ~occ1]
+
+        # every tower, grouped by its height and by who is on top
+        empty = ALL_SQUARES & ~occ2
+        single = occ2 & ~occ1               # one piece, the top is on tier z = 2
+        double = occ1 & ~occ0               # two pieces, the top is on tier z = 1
+        flat_capture = single & enemy[2]
+        stack_on_single = single & own[2] & ~kings
+        capture_double = double & enemy[1]
+        stack_on_double = double & own[1]
+        capture_full = occ0 & enemy[0]
+        # a full tower topped by an own piece: the move lands under the top piece, as in Piece.moves
+        stack_on_full = occ0 & own[0] & own[1]
+        capture_under_full = occ0 & own[0] & enemy[1]
+
+        # tier the move lands on plus the capture flag, for each group of target towers
+        groups = [(empty, 2), (flat_capture, 2 | CAPTURE_FLAG), (stack_on_single, 1),
+                  (capture_double, 1 | CAPTURE_FLAG), (stack_on_double, 0),
+                  (capture_full, CAPTURE_FLAG), (stack_on_full, 0), (capture_under_full, 1 | CAPTURE_FLAG)]
+        flat_groups = groups[:2] # king and fortress cannot stack and cannot capture towers
+        if (captures_only):
+            groups = [g for g in groups if g[1] & CAPTURE_FLAG]
+            flat_groups = groups[:1]
+
+        movelist = []
+        for type in range(1, 10):
+            code = team * type
+            for z in range(3):
+                if (type == 2):
+                    pcs = self.pieces[(code + 9) * 3 + z]
+                else:
+                    pcs = self.pieces[(code + 9) * 3 + z] & movable[z]
+                while pcs:
+                    bit = pcs & -pcs
+                    pcs ^= bit
+                    i = (bit.bit_length() - 1) * 3 + z
+                    head = (i << 8) | ((code + 9) << 16) # the moving piece and where it comes from
+                    targets = TARGET_MASKS[(code + 9) * 243 + i]
+                    twice = TARGET_TWICE[(code + 9) * 243 + i]
+                    for mask, landing in (flat_groups if type == 2 or type == 3 else groups):
+                        dest = targets & mask
+                        while dest:
+                            b = dest & -dest
+                            dest ^= b
+                            movelist.append(head | ((b.bit_length() - 1) * 3 + landing))
+                            if (twice & b):
+                                movelist.append(head | ((b.bit_length() - 1) * 3 + landing))
+        return movelist
+
+    def capture_codes(self, team):
+        # legal captures of a team packed into integers, for quiescence search
+        return self.legal_codes(team, True)
+
+
+BOARD_BACKENDS["bitboard"] = BitBoard
+
+
+def BitboardTest(setup, games = 20, plies = 100):
+    # differential test of BitBoard.legal_moves against the reference Piece.reference_moves
+    # plays random games from setup (for example StandardSetup) on a board and a BitBoard side by side
+    # and compares the move lists of every position, return True if they all agree
+    print("BitboardTest()----------------------")
+    positions = 0
+    mismatches = 0
+    for g in range(games):
+        reference = board(9, 9, 3)
+        bitboard = BitBoard(9, 9, 3)
+        setup(reference)
+        setup(bitboard)
+        team = 1
+        for ply in range(plies):
+            expected = []
+            try:
+                for p in reference.allpieces():
+                    if (p[0].team == team):
+                        expected += p[0].reference_moves(reference.squares, p[1])
+            except IndexError: # the reference pawn steps off the board from some stacked squares
+                break
+            moves = bitboard.legal_moves(team) if expected != [] else []
+            positions += 1
+            if (sorted(moves) != sorted(expected)):
+                mismatches += 1
+                print("mismatch in game", g, "ply", ply)
+                print(reference)
+            if (expected == [] or reference.check_winner() != 0):
+                break
+            move = random.choice(expected)
+            reference.push(move)
+            bitboard.push(move)
+            team *= -1
+    print("positions compared =", positions, ", mismatches =", mismatches)
+    print("--------------------------------------")
+    return mismatches == 0
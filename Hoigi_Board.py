@@ -1,4 +1,32 @@
 from Hoigi_Pieces import *
+from array import array
+import random
+import numpy
+
+# Zobrist keys for hashing positions, one random 64-bit number per (team, type, y, x, z)
+# stored flat at index (team * type + 9) * 243 + cell, where cell = (y * 9 + x) * 3 + z
+# the row of code 0 (empty) is all zeros, so xor-ing an empty cell in or out changes nothing
+# the seed is fixed so every process and every run agrees on the hash of a position
+_zobrist_random = random.Random(20230601)
+ZOBRIST_KEYS = [0 if code == 0 else _zobrist_random.getrandbits(64) for code in range(-9, 10) for cell in range(243)]
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64) # xor-ed in when black is to move
+
+# the colour-flipped mirror of a position: every white piece becomes black and the other way round,
+# and row y moves to row 8 - y, the way black's tables mirror white's
+# MIRROR_KEYS[(code + 9) * 243 + cell] is the Zobrist key of the piece that stands there in the mirrored position,
+# so a board keeps the hash of its mirror image (mirror_hash) as cheaply as its own
+MIRROR_CELL = [((8 - cell // 27) * 9 + (cell // 3) % 9) * 3 + cell % 3 for cell in range(243)]
+MIRROR_KEYS = [ZOBRIST_KEYS[(9 - code) * 243 + MIRROR_CELL[cell]] for code in range(-9, 10) for cell in range(243)]
+
+def mirror_move(move):
+    # the packed move that plays move in the mirrored position
+    code = ((move >> 16) & 31) - 9
+    return MIRROR_CELL[move & 255] | (MIRROR_CELL[(move >> 8) & 255] << 8) | ((9 - code) << 16) | (move & CAPTURE_FLAG)
+
+def zobrist_key(team, type, position):
+    # Zobrist key of a piece standing on [y,x,z]
+    return ZOBRIST_KEYS[(team * type + 9) * 243 + (position[0] * 9 + position[1]) * 3 + position[2]]
+
 class board:
     """ game board for chess
     """
@@ -14,7 +42,14 @@ class board:
         self.squares = [[[' ' for i in range(self.layers)] for j in range(self.height)] for k in range(self.width)] # always in the form of [rows, columns, layers]
         self.previous_move = []
         self.move_history = []
+        self.undo_stack = [] # what make_move overwrote, most recent last
         self.turn = 1  # indicator for who's turn it is
+        self.hash = 0  # Zobrist hash of the position and side to move, kept up to date on every change
+        self.mirror_hash = 0 # Zobrist hash of the pieces of the mirrored position (see MIRROR_KEYS), without the side to move
+        self.score = 0 # material and position value of the board, positive is good for white, kept up to date on every change
+        self.nnue = None        # network whose first layer is kept in accumulator, see attach_nnue in NNUE.py
+        self.accumulator = None # first layer of nnue for this position, kept up to date on every change while it is attached
+        self.piece_counts = [0, 0, 0] # pieces of each team on the board at index team (1 white, -1 black), kept up to date on every change
 
         # data format of position 9x9x3 x9, p is number of pieces 
         # 0 = empty square, 1 = white, -1 = black
@@ -26,8 +61,50 @@ class board:
         if (move == []):
             return
         
+        if (isinstance(move, int)): # packed move, see encode_move
+            move = decode_move(move)
         self.add_piece(move[0], move[1], 0, move[2], move[4])
         self.remove_piece(move[3], move[4])
+        self.changeturn()
+
+    def make_move(self, move):
+        """ push a move and remember the occupants of both squares it touches,
+            so that unmake_move can restore the position exactly
+            move is in the list format or packed into an integer
+        """
+        if (move == []):
+            self.undo_stack.append(None)
+            return
+        if (isinstance(move, int)):
+            move = decode_move(move)
+        d = move[2]
+        o = move[3]
+        self.undo_stack.append((move, self.squares[d[0]][d[1]][d[2]], self.squares[o[0]][o[1]][o[2]]))
+        self.push(move)
+
+    def unmake_move(self):
+        """ take back the last move played with make_move
+        """
+        undo = self.undo_stack.pop()
+        if (undo == None):
+            return
+        if (undo == "null"): # a null move only passed the turn
+            self.changeturn()
+            return
+        move, captured, mover = undo
+        self.place(move[3], mover)
+        self.place(move[2], captured)
+        self.changeturn()
+
+    def make_null_move(self):
+        # pass the turn without moving, for null move pruning in search
+        self.undo_stack.append("null")
+        self.changeturn()
+
+    def unmake_null_move(self):
+        # take back make_null_move, unmake_move does the same
+        self.undo_stack.pop()
+        self.changeturn()
 
 
     def __repr__(self):             #  representation without graphics
@@ -55,28 +132,57 @@ class board:
             for column in range(x):
                 for layer in range(z):
                     newboard.squares[row][column][layer] = self.squares[row][column][layer]
+        newboard.turn = self.turn
+        newboard.hash = self.hash
+        newboard.mirror_hash = self.mirror_hash
+        newboard.score = self.score
+        newboard.nnue = self.nnue
+        newboard.accumulator = None if self.accumulator is None else self.accumulator.copy()
+        newboard.piece_counts = list(self.piece_counts)
         return newboard
 
     def changeturn(self):
         self.turn *= -1
+        self.hash ^= ZOBRIST_SIDE
+
+    def place(self, position, occupant):
+        # put occupant (a Piece object or " ") on a [y,x,z] square, replacing whatever was there
+        # every change to the squares goes through here, so the hash, score and piece counts are kept up to date
+        old = self.squares[position[0]][position[1]][position[2]]
+        cell = (position[0] * 9 + position[1]) * 3 + position[2]
+        if (old != " "):
+            self.piece_counts[old.team] -= 1
+            self.hash ^= ZOBRIST_KEYS[(old.team * old.type + 9) * 243 + cell]
+            self.mirror_hash ^= MIRROR_KEYS[(old.team * old.type + 9) * 243 + cell]
+            self.score -= PIECE_SQUARE_VALUE[(old.team * old.type + 9) * 243 + cell]
+        if (occupant != " "):
+            self.piece_counts[occupant.team] += 1
+            self.hash ^= ZOBRIST_KEYS[(occupant.team * occupant.type + 9) * 243 + cell]
+            self.mirror_hash ^= MIRROR_KEYS[(occupant.team * occupant.type + 9) * 243 + cell]
+            self.score += PIECE_SQUARE_VALUE[(occupant.team * occupant.type + 9) * 243 + cell]
+        if (self.accumulator is not None):
+            old_code = 0 if old == " " else old.team * old.type
+            new_code = 0 if occupant == " " else occupant.team * occupant.type
+            self.accumulator += self.nnue.rows[(new_code + 9) * 243 + cell]
+            self.accumulator -= self.nnue.rows[(old_code + 9) * 243 + cell]
+        self.squares[position[0]][position[1]][position[2]] = occupant
 
     def add_piece(self, team, type, image, destination, capture):
         """ add a piece to a specified square on the Board
             team = 1 or -1
             type = integer representation of piece
-            image = .png image for piece
+            image = .png image for piece, unused as the board places the shared piece from PIECES
             destination = [y,x,z] position on board
             capture = boolean
 
         """
-        p = Piece(team, type, image)
-        self.squares[destination[0]][destination[1]][destination[2]] = p
+        self.place(destination, PIECES[team * type + 9])
 
     def remove_piece(self, original, capture):
         """ remove a piece from a specified square on the Board
             original = [y,x,z] position of the piece on board 
         """
-        self.squares[original[0]][original[1]][original[2]] = " "
+        self.place(original, " ")
         
     def check_winner(self):
         # return an integer, 0 = no winner, -1 = black is winner, 1 = white is winner
@@ -91,6 +197,10 @@ class board:
                 if (self.squares[y][x][2].type == 2 and self.squares[y][x][2].team == -1):  # find black king
                     winner -= 1
         return winner
+
+    def piece_count(self, team):
+        # number of pieces a team has on the board
+        return self.piece_counts[team]
     
     def allpieces(self):
         # return a list of all pieces on the board, and the position they are at in [y,x,z] format
@@ -104,8 +214,8 @@ class board:
         #print("allpieces list = ", list)
         return list
 
-    def legal_moves(self, team):
-        # return a list of all legal moves for a team
+    def team_moves(self, team):
+        # legal moves of a team in the list format, without the message legal_moves prints when there are none
         movelist = []
         a = self.allpieces()
         #print("allpices = ", a)
@@ -114,9 +224,340 @@ class board:
             position = x[1]
             if (p.team == team):
                 movelist += p.moves(self.squares, position)
+        return movelist
+
+    def legal_moves(self, team):
+        # return a list of all legal moves for a team
+        movelist = self.team_moves(team)
 
         if movelist == []:
             print("there are no legal moves")
 
         #print("debug move list 1 = ", movelist)
-        return movelist 
\ No newline at end of file
+        return movelist 
+
+    def legal_codes(self, team):
+        # legal moves of a team packed into integers, see encode_move
+        # search calls this in every node, so it goes through team_moves and prints nothing
+        return [encode_move(m) for m in self.team_moves(team)] 
+
+    def capture_codes(self, team):
+        # legal captures of a team packed into integers, for quiescence search
+        return [m for m in self.legal_codes(team) if m & CAPTURE_FLAG]
+
+    def code_at(self, cell):
+        # team * type of the piece in a flat cell index (y * 9 + x) * 3 + z, 0 for an empty square
+        occupant = self.squares[cell // 27][(cell // 3) % 9][cell % 3]
+        if (occupant == " "):
+            return 0
+        return occupant.team * occupant.type
+
+class ArrayBoard:
+    """ game board for chess stored as one flat array of signed bytes
+        every cell holds team * type, 0 for an empty square
+        the cell of [y,x,z] is at index (y * width + x) * layers + z
+        same public interface as board, but copies are a single buffer copy
+    """
+    def __init__(self, height, width, layers):
+        """ constructs a new board object
+        """
+        self.height = height
+        self.width = width
+        self.layers = layers
+        self.cells = array('b', bytes(height * width * layers))
+        self.previous_move = []
+        self.move_history = []
+        self.undo_stack = [] # what make_move overwrote, most recent last
+        self.turn = 1  # indicator for who's turn it is
+        self.hash = 0  # Zobrist hash of the position and side to move, kept up to date on every change
+        self.mirror_hash = 0 # Zobrist hash of the pieces of the mirrored position (see MIRROR_KEYS), without the side to move
+        self.score = 0 # material and position value of the board, positive is good for white, kept up to date on every change
+        self.nnue = None        # network whose first layer is kept in accumulator, see attach_nnue in NNUE.py
+        self.accumulator = None # first layer of nnue for this position, kept up to date on every change while it is attached
+        self.piece_counts = [0, 0, 0] # pieces of each team on the board at index team (1 white, -1 black), kept up to date on every change
+
+    def index(self, position):
+        # flat index of a [y,x,z] position
+        return (position[0] * self.width + position[1]) * self.layers + position[2]
+
+    def push(self, move):
+        # move format = [self.team, self.type, [y,x,z], [y,x,z], boolean]
+        # used only in minimax for simulating moves
+        if (move == []):
+            return
+
+        if (isinstance(move, int)): # packed move, see encode_move
+            self.place(move & 255, ((move >> 16) & 31) - 9)
+            self.place((move >> 8) & 255, 0)
+        else:
+            self.add_piece(move[0], move[1], 0, move[2], move[4])
+            self.remove_piece(move[3], move[4])
+        self.changeturn()
+
+    def make_move(self, move):
+        """ push a move and remember the codes of both cells it touches,
+            so that unmake_move can restore the position exactly
+            move is in the list format or packed into an integer
+        """
+        if (move == []):
+            self.undo_stack.append(None)
+            return
+        if (isinstance(move, int)):
+            d = move & 255
+            o = (move >> 8) & 255
+        else:
+            d = self.index(move[2])
+            o = self.index(move[3])
+        self.undo_stack.append((d, self.cells[d], o, self.cells[o]))
+        self.push(move)
+
+    def unmake_move(self):
+        """ take back the last move played with make_move
+        """
+        undo = self.undo_stack.pop()
+        if (undo == None):
+            return
+        if (undo == "null"): # a null move only passed the turn
+            self.changeturn()
+            return
+        d, captured, o, mover = undo
+        self.place(o, mover)
+        self.place(d, captured)
+        self.changeturn()
+
+    def make_null_move(self):
+        # pass the turn without moving, for null move pruning in search
+        self.undo_stack.append("null")
+        self.changeturn()
+
+    def unmake_null_move(self):
+        # take back make_null_move, unmake_move does the same
+        self.undo_stack.pop()
+        self.changeturn()
+
+    def __repr__(self):             #  representation without graphics
+        """ Returns a string representation for a Board object.
+                [layer 1],[layer 2],[layer 3]
+        """
+        s = ""
+        for y in range(self.height):
+            s += "--" * self.width + "-" + "\n"
+            s += "|"
+            for x in range(self.width):
+                s += "(" + ",".join(self.symbol(self.index([y, x, z])) for z in (2, 1, 0)) + ")" + "|"
+            s += "\n"
+        s += "--" * self.width + "-" + "\n"
+        return s
+
+    def code_at(self, i):
+        # team * type of the piece in cell i, 0 for an empty square
+        return self.cells[i]
+
+    def symbol(self, i):
+        # string of the piece in cell i, same as printing a square of board
+        if (self.cells[i] == 0):
+            return " "
+        return repr(PIECES[self.cells[i] + 9])
+
+    @property
+    def squares(self):
+        # nested [y][x][z] Piece objects and " ", the layout of board.squares
+        # built on demand, for code such as BoardToMatrix that reads the squares directly
+        # read-only: the snapshot is made of tuples, so board.squares[y][x][z] = ... raises TypeError
+        # instead of being lost, change the board with place, add_piece and remove_piece
+        return tuple(tuple(tuple(" " if self.cells[self.index([y, x, z])] == 0 else PIECES[self.cells[self.index([y, x, z])] + 9]
+                                 for z in range(self.layers)) for x in range(self.width)) for y in range(self.height))
+
+    def copy_board(self):
+        """ create and return a copy of the board object
+        """
+        newboard = self.__class__(self.height, self.width, self.layers)
+        newboard.cells = array('b', self.cells)
+        newboard.turn = self.turn
+        newboard.hash = self.hash
+        newboard.mirror_hash = self.mirror_hash
+        newboard.score = self.score
+        newboard.nnue = self.nnue
+        newboard.accumulator = None if self.accumulator is None else self.accumulator.copy()
+        newboard.piece_counts = list(self.piece_counts)
+        return newboard
+
+    def __deepcopy__(self, memo):
+        # searches deepcopy the board, a buffer copy is enough
+        newboard = self.copy_board()
+        newboard.previous_move = list(self.previous_move)
+        newboard.move_history = list(self.move_history)
+        newboard.undo_stack = list(self.undo_stack)
+        return newboard
+
+    def changeturn(self):
+        self.turn *= -1
+        self.hash ^= ZOBRIST_SIDE
+
+    def place(self, i, code):
+        # put code (team * type, 0 for empty) in cell i, replacing whatever was there
+        # every change to the cells goes through here, so the hash, score and piece counts are kept up to date
+        old_code = self.cells[i]
+        if (old_code > 0):
+            self.piece_counts[1] -= 1
+        elif (old_code < 0):
+            self.piece_counts[-1] -= 1
+        if (code > 0):
+            self.piece_counts[1] += 1
+        elif (code < 0):
+            self.piece_counts[-1] += 1
+        old = (old_code + 9) * 243 + i
+        new = (code + 9) * 243 + i
+        self.hash ^= ZOBRIST_KEYS[old] ^ ZOBRIST_KEYS[new]
+        self.mirror_hash ^= MIRROR_KEYS[old] ^ MIRROR_KEYS[new]
+        self.score += PIECE_SQUARE_VALUE[new] - PIECE_SQUARE_VALUE[old]
+        if (self.accumulator is not None):
+            self.accumulator += self.nnue.rows[new]
+            self.accumulator -= self.nnue.rows[old]
+        self.cells[i] = code
+
+    def add_piece(self, team, type, image, destination, capture):
+        """ add a piece to a specified square on the Board
+            team = 1 or -1
+            type = integer representation of piece
+            image = unused, kept for the same signature as board
+            destination = [y,x,z] position on board
+            capture = boolean
+        """
+        self.place(self.index(destination), team * type)
+
+    def remove_piece(self, original, capture):
+        """ remove a piece from a specified square on the Board
+            original = [y,x,z] position of the piece on board
+        """
+        self.place(self.index(original), 0)
+
+    def check_winner(self):
+        # return an integer, 0 = no winner, -1 = black is winner, 1 = white is winner
+        # kings only ever stand on layer 1, so counting the king codes is enough
+        return self.cells.count(2) - self.cells.count(-2)
+
+    def piece_count(self, team):
+        # number of pieces a team has on the board
+        return self.piece_counts[team]
+
+    def allpieces(self):
+        # return a list of all pieces on the board, and the position they are at in [y,x,z] format
+        # return [list, [y,x,z]]
+        list = []
+        for i, code in enumerate(self.cells):
+            if (code != 0):
+                list += [[PIECES[code + 9], [i // (self.width * self.layers), (i // self.layers) % self.width, i % self.layers]]]
+        return list
+
+    def piece_codes(self, code, i, captures_only = False):
+        # moves of the piece with code team * type standing in cell i, packed into integers
+        # follows the same rules as Piece.moves, captures_only = True leaves out the moves that capture nothing
+        cells = self.cells
+        team = 1 if code > 0 else -1
+        type = code * team
+        z = i % self.layers
+
+        # check for if there is another piece on top of the current piece
+        if (type != 2 and (z == 1 and cells[i - 1] != 0 or z == 2 and (cells[i - 2] != 0 or cells[i - 1] != 0))):
+            return []
+
+        head = (i << 8) | ((code + 9) << 16) # the moving piece and where it comes from, see encode_move
+        result_moves = []
+        for ty, tx, base in MOVE_TARGETS[(code + 9) * 243 + i]:
+            if (cells[base + 2] == 0):  # the empty square is a possible move
+                if (not captures_only):
+                    result_moves.append(head | (base + 2))
+            elif (type == 2 or type == 3): # king and fortress cannot stack and cannot capture towers
+                if (cells[base] == 0 and cells[base + 1] == 0 and cells[base + 2] * team < 0):
+                    result_moves.append(head | (base + 2) | CAPTURE_FLAG)
+            else:
+                for l in range(3): ## [layer3, layer2, layer1]
+                    c = cells[base + l]
+                    if (c == 0):
+                        continue
+                    elif (c * team > 0 and l > 0 and c * team != 2):
+                        if (not captures_only):
+                            result_moves.append(head | (base + l - 1))
+                        break
+                    elif (c * team < 0):
+                        result_moves.append(head | (base + l) | CAPTURE_FLAG)
+                        break
+        return result_moves
+
+    def legal_codes(self, team):
+        # legal moves of a team packed into integers, see encode_move
+        movelist = []
+        for i, code in enumerate(self.cells):
+            if (code * team > 0):
+                movelist += self.piece_codes(code, i)
+        return movelist
+
+    def capture_codes(self, team):
+        # legal captures of a team packed into integers, for quiescence search
+        movelist = []
+        for i, code in enumerate(self.cells):
+            if (code * team > 0):
+                movelist += self.piece_codes(code, i, True)
+        return movelist
+
+    def legal_moves(self, team):
+        # return a list of all legal moves for a team
+        movelist = [decode_move(m) for m in self.legal_codes(team)]
+
+        if movelist == []:
+            print("there are no legal moves")
+
+        return movelist
+
+
+# board implementations that can be chosen by name, other modules add their own
+BOARD_BACKENDS = {"list": board, "array": ArrayBoard}
+
+def new_board(backend = "list"):
+    # return an empty 9x9x3 board of the chosen backend
+    return BOARD_BACKENDS[backend](9, 9, 3)
+
+
+# neural network input, the layout of BoardToMatrix in Main: 18 planes of 9x9x3, 1 where a piece is present
+# planes 0 to 8 are the white types 1 to 9, planes 9 to 17 the black types 1 to 9
+# plane of each code at index code + 9, -1 for an empty square
+PLANE_OF_CODE = numpy.array([8 - code if code < 0 else code - 1 for code in range(-9, 10)])
+PLANE_OF_CODE[9] = -1
+
+def encode_boards(boards):
+    # team * type of every cell of each board, an int8 array of shape (len(boards), 243)
+    codes = numpy.zeros((len(boards), 243), dtype = numpy.int8)
+    for n, b in enumerate(boards):
+        if (hasattr(b, "cells")):
+            codes[n] = numpy.frombuffer(b.cells, dtype = numpy.int8)
+        else:
+            codes[n] = [b.code_at(i) for i in range(243)]
+    return codes
+
+def boards_to_matrix(boards):
+    # BoardToMatrix of many boards at once, a float32 array of shape (len(boards), 18, 9, 9, 3)
+    # boards is a list of boards, or their codes from encode_boards
+    codes = boards if isinstance(boards, numpy.ndarray) else encode_boards(boards)
+    data = numpy.zeros((len(codes), 18 * 243), dtype = numpy.float32)
+    n, cell = numpy.nonzero(codes)
+    data[n, PLANE_OF_CODE[codes[n, cell] + 9] * 243 + cell] = 1
+    return data.reshape(len(codes), 18, 9, 9, 3)
+
+def uniform_priors(moves):
+    # the same prior probability for every move, for the MCTS evaluators that only give a value
+    return [1 / len(moves)] * len(moves)
+
+def white_value(output):
+    # value for white, from -1 to 1, of the (draw, white wins, black wins) output of a model like the one in SL_NN.py
+    return float(output[1] - output[2])
+
+# PIECE_SQUARE_VALUE as an array, to score many positions with one gather
+PIECE_SQUARE_ARRAY = numpy.array(PIECE_SQUARE_VALUE, dtype = numpy.float64)
+PIECE_SQUARE_OFFSET = 9 * 243 + numpy.arange(243) # index of the empty code on each cell
+
+def eval_boards(boards):
+    # board.score of many boards at once, a float64 array of length len(boards)
+    # boards is a list of boards, or their codes from encode_boards, so stored positions can be scored without a board
+    codes = boards if isinstance(boards, numpy.ndarray) else encode_boards(boards)
+    return PIECE_SQUARE_ARRAY.take(codes.astype(numpy.intp) * 243 + PIECE_SQUARE_OFFSET).sum(axis = 1)
@@ -1,11 +1,18 @@
+# value of each piece type, index type - 1
+# Using the Shogi_strategy wiki page as reference
+PIECE_VALUE = [10, 40, 20, 130, 50, 70, 60, 90, 30]
+
 class Piece:
+    # pieces are shared between boards (see PIECES), so they are slotted and cannot be changed once made
+    __slots__ = ("team", "image", "onhold", "type")
+    value = PIECE_VALUE # one value table for all pieces
+
     def __init__(self, team, type, image, killable=False):
-        self.team = team ## -1 for black, 0 for empty square, 1 for white
-        self.image = image
-        self.value = [10, 40, 20, 130, 50, 70, 60, 90, 30] # Using the Shogi_strategy wiki page as reference
-        self.onhold = True     ## if the piece is not on the board yet
+        object.__setattr__(self, "team", team) ## -1 for black, 0 for empty square, 1 for white
+        object.__setattr__(self, "image", image)
+        object.__setattr__(self, "onhold", True)     ## if the piece is not on the board yet
         
-        self.type = type
+        object.__setattr__(self, "type", type)
         """
         ## pawn = 1
         ## king = 2
@@ -24,6 +31,23 @@ class Piece:
         ## samurai = 12
         ## major = 13
         """
+    def __setattr__(self, name, value):
+        raise AttributeError("Piece objects are shared and cannot be changed")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # copies of a board share the same pieces
+        return self
+
+    def __reduce__(self):
+        # pickling cannot set the slots one by one (see __setattr__), so a piece is rebuilt from its arguments
+        # one of the shared PIECES comes back as the same shared instance
+        if (isinstance(self.type, int) and PIECES[self.team * self.type + 9] is self):
+            return (piece_from_code, (self.team * self.type,))
+        return (Piece, (self.team, self.type, self.image))
+
     ## return the layers on a square in top to bottom order
     ##def get_layer(coordinate):
     ##    result = [x for x in board[coordinate[0]][coordinate[1]]]
@@ -508,6 +532,38 @@ class Piece:
 
     def moves(self, board, position):
         # generate a list of moves for the current piece object
+        # the squares the piece can reach come from MOVE_TARGETS, only the occupancy is checked here
+        y = position[0]
+        x = position[1]
+        z = position[2]
+
+        # check for if there is another piece on top of the current piece
+        if (self.type != 2 and (z == 1 and board[y][x][0] != " " or z == 2 and (board[y][x][0] != " " or board[y][x][1] != " "))):
+            return []
+
+        result_moves = []
+        for ty, tx, base in MOVE_TARGETS[(self.team * self.type + 9) * 243 + (y * 9 + x) * 3 + z]:
+            tower = board[ty][tx]
+            if (tower[2] == " "):  # the empty square is a possible move
+                result_moves.append([self.team, self.type, [ty, tx, 2], position, False])
+            elif (self.type == 2 or self.type == 3): # king and fortress cannot stack and cannot capture towers
+                if (tower[0] == " " and tower[1] == " " and tower[2].team == -self.team):
+                    result_moves.append([self.team, self.type, [ty, tx, 2], position, True])
+            else:
+                for l in range(3): ## [layer3, layer2, layer1]
+                    if (tower[l] == " "):
+                        continue
+                    elif (tower[l].team == self.team and l > 0 and tower[l].type != 2):
+                        result_moves.append([self.team, self.type, [ty, tx, l-1], position, False])
+                        break
+                    elif (tower[l].team == -self.team):
+                        result_moves.append([self.team, self.type, [ty, tx, l], position, True])
+                        break
+        return result_moves
+
+    def reference_moves(self, board, position):
+        # generate the moves with the per-type methods above, which compute everything on every call
+        # kept as the reference that the table driven moves are checked against
         movelist = []
         if (self.type == 1):
             
@@ -642,3 +698,293 @@ class Piece:
     #     else:
     #         pass
     #     return self.remove_invalid_moves(result_moves)
+
+
+# flip the position values for black because black is on the other side of the board
+# [y,x,z]
+whitePawnEval = [
+[[-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10]],
+[[ -7, -8, -9], [ -7, -8, -9], [ -7, -8, -9], [ -7, -8, -9], [ -6, -7, -8], [ -7, -8, -9], [ -7, -8, -9], [ -7, -8, -9], [ -7, -8, -9]],
+[[ -4, -5, -6], [ -3, -4, -5], [ -2, -3, -4], [ -1, -2, -3], [  0, -1, -2], [ -1, -2, -3], [ -2, -3, -4], [ -3, -4, -5], [ -4, -5, -6]],
+[[  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  5,  4,  3], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1]],
+[[  6,  5,  4], [  7,  6,  5], [  8,  7,  6], [  9,  8,  7], [ 10,  9,  8], [  9,  8,  7], [  8,  7,  6], [  7,  6,  5], [  0,  0,  4]],
+[[  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1]],
+[[  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0]],
+[[  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0]],
+[[  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0]]]
+blackPawnEval = list(reversed(whitePawnEval)) 
+whiteKingEval = [
+[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
+[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
+[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
+[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
+[[0,0,-3.0], [0,0,-4.0], [0,0,-4.0], [0,0,-5.0], [0,0,-6.0], [0,0,-5.0], [0,0,-4.0], [0,0,-4.0], [0,0,-3.0]],
+[[0,0,-2.0], [0,0,-3.0], [0,0,-3.0], [0,0,-4.0], [0,0,-5.0], [0,0,-4.0], [0,0,-3.0], [0,0,-3.0], [0,0,2.0]],
+[[0,0,-1.0], [0,0,-2.0], [0,0,-2.0], [0,0,-3.0], [0,0,-4.0], [0,0,-3.0], [0,0,-2.0], [0,0,-2.0], [0,0,-1.0]],
+[[0,0,2.0],  [0,0,1.0], [0,0, 1.0], [0,0, 0], [0,0, 0],  [0,0,0],  [0,0,1.0],  [0,0,1.0],  [0,0,2.0]],
+[[0,0,3.0],  [0,0,2.0],  [0,0,1.0], [0,0, 1.0],  [0,0,0],  [0,0,1.0],  [0,0,1.0],  [0,0,2.0],  [0,0,3.0]]]
+blackKingEval = list(reversed(whiteKingEval))
+whiteFortressEval = [
+[[  0,  0, -8], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -8]],
+[[  0,  0, -7], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -7]],
+[[  0,  0, -6], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -6]],
+[[  0,  0, -5], [  0,  0, -4], [  0,  0, -3], [  0,  0, -3], [  0,  0, -3], [  0,  0, -3], [  0,  0, -4], [  0,  0, -4], [  0,  0, -5]],
+[[  0,  0, -2], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -2]],
+[[  0,  0, -1], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  5], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0, -1]],
+[[  0,  0,  0], [  0,  0,  4], [  0,  0,  5], [  0,  0,  5], [  0,  0,  5], [  0,  0,  5], [  0,  0,  5], [  0,  0,  4], [  0,  0,  0]],
+[[  0,  0, -1], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0, -1]],
+[[  0,  0, -2], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0, -2]]]
+blackFortressEval = list(reversed(whiteFortressEval))
+whiteArcherEval = [
+[[ -6, -7, -8], [ -5, -6, -7], [ -4, -5, -6], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -4, -5, -6], [ -5, -6, -7], [ -6, -7, -8]],
+[[ -4, -5, -6], [ -3, -4, -5], [ -2, -3, -4], [ -1, -2, -3], [  0, -1, -2], [ -1, -2, -3], [ -2, -3, -4], [ -3, -4, -5], [ -4, -5, -6]],
+[[ -4, -5, -6], [ -2, -3, -4], [ -1, -2, -3], [  0,  0, -1], [  1, 0,  -1], [  0,  0, -1], [ -1, -2, -3], [ -2, -3, -4], [ -4, -5, -6]],
+[[  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  5,  4,  3], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1]],
+[[  6,  5,  4], [  7,  6,  5], [  8,  7,  6], [  9,  8,  7], [ 10,  9,  8], [  9,  8,  7], [  8,  7,  6], [  7,  6,  5], [  6,  5,  4]],
+[[  3,  2,  1], [  3,  2,  1], [  6,  5,  4], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  6,  5,  4], [  3,  2,  1], [  3,  2,  1]],
+[[  1,  0,  0], [  2,  1,  0], [  3,  2,  1], [  5,  4,  3], [  6,  5,  4], [  5,  4,  3], [  3,  2,  1], [  2,  1,  0], [  1,  0,  0]],
+[[  0,  0,  0], [  2,  1,  0], [  2,  1,  0], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  2,  1,  0], [  1,  0,  0], [  0,  0,  0]],
+[[  0,  0,  0], [  0,  0,  0], [  1,  0,  0], [  1,  0,  0], [  1,  0,  0], [  1,  0,  0], [  1,  0,  0], [  0,  0,  0], [  0,  0,  0]]]
+blackArcherEval = list(reversed(whiteArcherEval))
+whiteLieutenantEval = [
+[[ -7, -8, -9], [ -7, -8, -9], [ -6, -7, -8], [ -6, -7, -8], [ -6, -7, -8], [ -6, -7, -8], [ -6, -7, -8], [ -7, -8, -9], [ -7, -8, -9]],
+[[ -4, -5, -6], [ -4, -5, -6], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -4, -5, -6], [ -4, -5, -6]],
+[[ -3, -4, -5], [ -3, -4, -5], [ -2, -3, -4], [ -2, -3, -4], [ -2, -3, -4], [ -2, -3, -4], [ -2, -3, -4], [ -3, -4, -5], [ -3, -4, -5]],
+[[  1,  0, -1], [  1,  0, -1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  1,  0, -1], [  1,  0, -1]],
+[[  1,  0, -1], [  2,  1,  0], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  4,  3,  2], [  1,  0, -1]],
+[[  2,  1,  0], [  3,  2,  1], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  3,  2,  1], [  2,  1,  0]],
+[[  1,  0,  0], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0,  0]],
+[[ -1,  0,  0], [  0,  0,  0], [  1,  0,  0], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  1,  0,  0], [  1,  0,  0], [ -1,  0,  0]],
+[[ -2, -1,  0], [  0,  0, -1], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0, -1], [ -2, -1,  0]]]
+blackLieutenantEval = list(reversed(whiteLieutenantEval))
+whiteGeneralEval = [
+[[ -6, -7, -8], [ -6, -7, -8], [ -5, -6, -7], [ -5, -6, -7], [ -5, -6, -7], [ -5, -6, -7], [ -5, -6, -7], [ -6, -7, -8], [ -6, -7, -8]],
+[[ -4, -5, -6], [ -4, -5, -6], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -4, -5, -6]],
+[[ -2, -3, -4], [ -2, -3, -4], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [ -2, -3, -4], [ -3, -4, -5]],
+[[  1,  0, -1], [  3,  2,  1], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  3,  2,  1], [  1,  0, -1]],
+[[  2,  1,  0], [  4,  3,  2], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  4,  3,  2], [  2,  1,  0]],
+[[  2,  1,  0], [  3,  2,  1], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  3,  2,  1], [  2,  1,  0]],
+[[  1,  0,  0], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0,  0]],
+[[ -1,  0,  0], [  0,  0,  0], [  1,  0,  0], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  1,  0,  0], [  1,  0,  0], [ -1,  0,  0]],
+[[ -2, -1,  0], [  0,  0, -1], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0, -1], [ -2, -1,  0]]]
+blackGeneralEval = list(reversed(whiteGeneralEval))
+whiteCaptainEval = [
+[[ -3, -5, -7], [ -3, -5, -7], [ -2, -4, -6], [ -2, -4, -6], [ -2, -4, -6], [ -2, -4, -6], [ -2, -4, -6], [ -3, -5, -7], [ -3, -5, -7]],
+[[ -2, -4, -6], [ -2, -4, -6], [ -1, -3, -5], [ -1, -3, -5], [ -1, -3, -5], [ -1, -3, -5], [ -1, -3, -5], [ -2, -4, -6], [ -2, -4, -6]],
+[[ -1, -3, -5], [ -1, -3, -5], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [ -1, -3, -5], [ -1, -3, -5]],
+[[  1,  0, -1], [  1,  0, -1], [  2,  0, -2], [  2,  0, -2], [  2,  0, -2], [  2,  0, -2], [  2,  0, -2], [  1,  0, -1], [  1,  0, -1]],
+[[  2,  1,  0], [  2,  1,  0], [  4,  2,  0], [  6,  4,  2], [  7,  5,  3], [  6,  4,  2], [  4,  2,  0], [  2,  1,  0], [  2,  0, -2]],
+[[  2,  1,  0], [  4,  2,  0], [  4,  2,  0], [  6,  4,  2], [  6,  4,  2], [  6,  4,  2], [  4,  2,  0], [  4,  2,  0], [  2,  1,  0]],
+[[  2,  1,  0], [  2,  1,  0], [  4,  2,  0], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  2,  1,  0]],
+[[  1,  0, -1], [  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1], [  1,  0, -1]],
+[[  1,  0, -1], [  1,  0, -1], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  1,  0, -1], [  1,  0, -1]]]
+blackCaptainEval = list(reversed(whiteCaptainEval))
+whiteCannonEval = [
+[[ -7, -8, -9], [ -6, -7, -8], [ -5, -6, -7], [ -4, -5, -6], [ -4, -5, -6], [ -4, -5, -6], [ -5, -6, -7], [ -6, -7, -8], [ -7, -8, -9]],
+[[ -6, -7, -8], [ -5, -6, -7], [ -4, -5, -6], [ -2, -3, -4], [ -2, -3, -4], [ -2, -3, -4], [ -4, -5, -6], [ -4, -5, -6], [ -6, -7, -8]],
+[[ -4, -5, -6], [ -2, -3, -4], [ -1, -2, -3], [ -1, -2, -3], [  1,  0, -1], [ -1, -2, -3], [ -1, -2, -3], [ -2, -3, -4], [ -4, -5, -6]],
+[[  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  5,  4,  3], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1]],
+[[  6,  5,  4], [  7,  6,  5], [  8,  7,  6], [  9,  8,  7], [ 10,  9,  8], [  9,  8,  7], [  8,  7,  6], [  7,  6,  5], [  6,  5,  4]],
+[[  3,  2,  1], [  3,  2,  1], [  6,  5,  4], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  6,  5,  4], [  3,  2,  1], [  3,  2,  1]],
+[[  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  5,  4,  3], [  6,  5,  4], [  4,  3,  2], [  3,  2,  1], [  3,  2,  1], [  2,  1,  0]],
+[[  1,  0, -1], [  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1], [  1,  0, -1]],
+[[  0, -1, -2], [  1,  0, -1], [  1,  0, -1], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  1,  0, -1], [  1,  0, -1], [  0, -1, -2]]]
+blackCannonEval = list(reversed(whiteCannonEval))
+whiteMusketeerEval = [
+[[-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8]],
+[[ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9]],
+[[ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7]],
+[[  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1]],
+[[ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6]],
+[[ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6]],
+[[  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3]],
+[[  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1]],
+[[  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0]]]
+blackMusketeerEval = list(reversed(whiteMusketeerEval))
+""" Backup Position Values
+    [-4.0, -5.0, -5.0, -6.0, -7.0, -6.0, -5.0, -5.0, -4.0],
+    [-4.0, -5.0, -5.0, -6.0, -7.0, -6.0, -5.0, -5.0, -4.0],
+    [-4.0, -5.0, -5.0, -6.0, -7.0, -6.0, -5.0, -5.0, -4.0],
+    [-4.0, -5.0, -5.0, -6.0, -7.0, -6.0, -5.0, -5.0, -4.0],
+    [-3.0, -4.0, -4.0, -5.0, -6.0, -5.0, -4.0, -4.0, -3.0],
+    [-2.0, -3.0, -3.0, -4.0, -5.0, -4.0, -3.0, -3.0, -2.0],
+    [-1.0, -2.0, -2.0, -3.0, -4.0, -3.0, -2.0, -2.0, -1.0],
+    [ 2.0,  1.0,  1.0,  0,  0,  0,  1.0,  1.0,  2.0],
+    [ 3.0,  2.0,  1.0,  1.0,  0,  1.0,  1.0,  2.0,  3.0]]
+[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
+[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
+[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
+[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
+[[0,0,-3.0], [0,0,-4.0], [0,0,-4.0], [0,0,-5.0], [0,0,-6.0], [0,0,-5.0], [0,0,-4.0], [0,0,-4.0], [0,0,-3.0]],
+[[0,0,-2.0], [0,0,-3.0], [0,0,-3.0], [0,0,-4.0], [0,0,-5.0], [0,0,-4.0], [0,0,-3.0], [0,0,-3.0], [0,0,2.0]],
+[[0,0,-1.0], [0,0,-2.0], [0,0,-2.0], [0,0,-3.0], [0,0,-4.0], [0,0,-3.0], [0,0,-2.0], [0,0,-2.0], [0,0,-1.0]],
+[[0,0,2.0],  [0,0,1.0], [0,0, 1.0], [0,0, 0], [0,0, 0],  [0,0,0],  [0,0,1.0],  [0,0,1.0],  [0,0,2.0]],
+[[0,0,3.0],  [0,0,2.0],  [0,0,1.0], [0,0, 1.0],  [0,0,0],  [0,0,1.0],  [0,0,1.0],  [0,0,2.0],  [0,0,3.0]]]
+"""
+# Put the position values in dictionary for easy access
+WhitePiecePositionValue = {1:whitePawnEval,
+                           2:whiteKingEval,
+                           3:whiteFortressEval,
+                           4:whiteArcherEval,
+                           5:whiteLieutenantEval,
+                           6:whiteGeneralEval,
+                           7:whiteCaptainEval,
+                           8:whiteCannonEval,
+                           9:whiteMusketeerEval}
+BlackPiecePositionValue = {1:blackPawnEval,
+                           2:blackKingEval,
+                           3:blackFortressEval,
+                           4:blackArcherEval,
+                           5:blackLieutenantEval,
+                           6:blackGeneralEval,
+                           7:blackCaptainEval,
+                           8:blackCannonEval,
+                           9:blackMusketeerEval}
+PiecePositionValue = {1:WhitePiecePositionValue, 
+                     -1:BlackPiecePositionValue}
+
+
+# the 18 pieces every board shares, one per (team, type), at index team * type + 9
+PIECES = [None if code == 0 else Piece(1 if code > 0 else -1, abs(code), 0) for code in range(-9, 10)]
+
+def piece_from_code(code):
+    # the shared piece with team * type = code
+    return PIECES[code + 9]
+
+# material plus position value of every (team, type, y, x, z), signed so that positive is good for white
+# stored flat at index (team * type + 9) * 243 + cell, where cell = (y * 9 + x) * 3 + z
+# the row of code 0 (empty) is all zeros
+# the boards add and subtract entries of this table as pieces come and go, so eval_board is a lookup
+def piece_square_value_table():
+    table = [0] * (19 * 243)
+    for team in (1, -1):
+        for type in range(1, 10):
+            for y in range(9):
+                for x in range(9):
+                    for z in range(3):
+                        table[(team * type + 9) * 243 + (y * 9 + x) * 3 + z] = \
+                            team * (PIECE_VALUE[type - 1] + PiecePositionValue[team][type][y][x][z])
+    return table
+
+PIECE_SQUARE_VALUE = piece_square_value_table()
+
+
+def piece_targets(type, team, y, x, z):
+    """ return the [y,x] squares a piece standing on [y,x,z] may try to land on
+        in the same order as the per-type move methods of Piece try them
+        only the geometry is handled here, occupancy is checked by the board
+    """
+    result = []
+    if (type == 1): # pawn
+        if (z == 2):
+            if (y > 0 and y < 8):
+                result = [[y - team, x]]
+        else:
+            result = [[y - team, x + j] for j in (-1, 0, 1)]
+    elif (type == 2 or type == 3 or (type == 7 and z == 2)): # king, fortress and captain on layer 1
+        for j in (-1, 0, 1):
+            for k in (-1, 0, 1):
+                if (j != 0 or k != 0):
+                    result.append([y + k, x + j])
+    elif (type == 4): # archer, range based on tier
+        n = 3 - z
+        for k in range(-n, n + 1):
+            if (k == -n or k == n):
+                j_list = range(-n, n + 1)
+            else:
+                j_list = [-n, n]
+            for j in j_list:
+                result.append([y + k, x + j])
+    elif (type == 5): # lieutenant
+        if (z == 2):
+            result = [[y-1, x-1], [y-1, x], [y - 1 * team, x+1], [y+1, x-1], [y+1, x+1]]
+        elif (z == 1):
+            result = [[y-1, x-1], [y-1, x], [y-1, x+1], [y+1, x-1], [y+1, x], [y+1, x+1]]
+        else:
+            result = [[y-1, x-1], [y-1, x], [y-1, x+1], [y+1, x-1], [y+1, x], [y+1, x+1], [y, x-1], [y, x+1]]
+    elif (type == 6): # general
+        if (z == 2):
+            result = [[y - 1 * team, x-1], [y-1, x], [y - 1 * team, x+1], [y, x-1], [y, x+1], [y+1, x]]
+        elif (z == 1):
+            result = [[y-1, x-1], [y-1, x], [y-1, x+1], [y+1, x-1], [y+1, x], [y+1, x+1], [y, x-1], [y, x+1]]
+        else:
+            result = [[y-1, x-1], [y-1, x], [y-1, x+1], [y+1, x-1], [y+1, x], [y+1, x+1], [y, x-1], [y, x+1],
+                      [y - 2 * team, x-1], [y - 2 * team, x], [y - 2 * team, x+1]]
+    elif (type == 8): # cannon, move orthogonally
+        move = 3 - z
+        for i in range(-move, move + 1):
+            if (i != 0):
+                result.append([y + i, x])
+                result.append([y, x + i])
+    elif (type == 9): # musketeer, move straight forward
+        for i in range(1, 3 - z + 1):
+            result.append([y - i * team, x])
+    # captain on layer 2 and 3 borrows the moves of the covered piece, which can never move
+
+    return [t for t in result if t[0] >= 0 and t[0] <= 8 and t[1] >= 0 and t[1] <= 8]
+
+def move_target_table():
+    # squares every piece can try to land on, for each (team, type, y, x, z)
+    # index (team * type + 9) * 243 + cell, like PIECE_SQUARE_VALUE
+    # entries are (y, x, cell of the bottom of that tower)
+    table = [()] * (19 * 243)
+    for team in (1, -1):
+        for type in range(1, 10):
+            for y in range(9):
+                for x in range(9):
+                    for z in range(3):
+                        table[(team * type + 9) * 243 + (y * 9 + x) * 3 + z] = \
+                            tuple((t[0], t[1], (t[0] * 9 + t[1]) * 3) for t in piece_targets(type, team, y, x, z))
+    return table
+
+# generated once at import, move generation only has to look at the towers listed here
+MOVE_TARGETS = move_target_table()
+
+
+# moves packed into one integer, used by move generation and search instead of the list format
+# bits 0-7 destination cell, bits 8-15 original cell, bits 16-20 team * type + 9, bit 21 capture
+# a cell is (y * 9 + x) * 3 + z, every real move is non-zero so 0 can stand for "no move"
+CAPTURE_FLAG = 1 << 21
+
+def encode_move(move):
+    # [team, type, [y,x,z], [y,x,z], boolean] -> integer
+    d = move[2]
+    o = move[3]
+    code = (d[0] * 9 + d[1]) * 3 + d[2]
+    code |= ((o[0] * 9 + o[1]) * 3 + o[2]) << 8
+    code |= (move[0] * move[1] + 9) << 16
+    if (move[4]):
+        code |= CAPTURE_FLAG
+    return code
+
+def decode_move(code):
+    # integer -> [team, type, [y,x,z], [y,x,z], boolean]
+    d = code & 255
+    o = (code >> 8) & 255
+    piece = ((code >> 16) & 31) - 9
+    team = 1 if piece > 0 else -1
+    return [team, piece * team, [d // 27, (d // 3) % 9, d % 3], [o // 27, (o // 3) % 9, o % 3], (code & CAPTURE_FLAG) != 0]
+
+def move_to_pgn(code):
+    # integer -> one move of the PGNconvertor string format, '1,2,3,4,5,6,7,8,0' without the "|"
+    move = decode_move(code)
+    temp = [move[0], move[1], move[2][0], move[2][1], move[2][2], move[3][0], move[3][1], move[3][2], 1 if move[4] else 0]
+    return ",".join(str(i) for i in temp)
+
+def pgn_to_move(s):
+    # one move of the PGNconvertor string format -> integer
+    m = [int(i) for i in s.strip("|").split(",")]
+    return encode_move([m[0], m[1], [m[2], m[3], m[4]], [m[5], m[6], m[7]], m[8] == 1])
+
+if __name__ == "__main__":
+    # self checks of the shared tables, run with python Hoigi_Pieces.py
+    import pickle
+    for p in PIECES:
+        if (p != None):
+            assert pickle.loads(pickle.dumps(p)) is p, "a shared piece must unpickle as the same instance"
+    assert pickle.loads(pickle.dumps(PIECES[1:4])) == PIECES[1:4]
+    for code in range(-9, 10):
+        if (code != 0):
+            move = [1 if code > 0 else -1, abs(code), [4, 5, 1], [3, 5, 2], code % 2 == 0]
+            assert decode_move(encode_move(move)) == move
+    print("Hoigi_Pieces self checks passed")
@@ -0,0 +1,175 @@
+from Hoigi_Board import *
+from multiprocessing import shared_memory
+import multiprocessing
+import queue
+import time
+
+# one process owns the value network and evaluates positions for many self-play worker processes
+# a worker writes the cell codes of its positions (see encode_boards) into its own slot of a shared memory block,
+# puts (client number, number of positions) on the request queue and waits on its response queue
+# the server takes requests until it has max_batch_size positions or max_wait_us microseconds have passed since
+# the first one, runs one model.predict over all of them and writes each worker's outputs back into its slot
+#
+# usage:
+#   server = InferenceServer(functools.partial(load_keras_model, "model.keras"), clients = 32)
+#   server.start()
+#   worker i (started after server.start()) plays with MCTS_Player(team, evaluator = ServerEvaluator(server.client(i)))
+#   server.stop()
+
+def load_keras_model(path):
+    # model loader for the server, TensorFlow is only imported in the server process
+    from tensorflow import keras
+    return keras.models.load_model(path)
+
+
+class InferenceServer:
+    """ batched inference for many processes
+        model_loader is called in the server process and returns an object with predict(x, verbose) like a Keras model,
+        it must be picklable (a module level function, or functools.partial of one)
+        clients is the number of worker processes, each can send up to slot_positions positions per request
+        outputs is the width of the model output, 3 for the model of SL_NN.py (draw, white wins, black wins)
+    """
+    def __init__(self, model_loader, clients = 1, max_batch_size = 256, max_wait_us = 1000, slot_positions = 64, outputs = 3):
+        self.model_loader = model_loader
+        self.clients = clients
+        self.max_batch_size = max_batch_size
+        self.max_wait_us = max_wait_us
+        self.slot_positions = slot_positions
+        self.outputs = outputs
+        self.inputs = shared_memory.SharedMemory(create = True, size = clients * slot_positions * 243)
+        self.results = shared_memory.SharedMemory(create = True, size = clients * slot_positions * outputs * 4)
+        self.requests = multiprocessing.Queue()
+        self.responses = [multiprocessing.Queue() for i in range(clients)]
+        self.batches = multiprocessing.Value('q', 0)   # number of model.predict calls
+        self.positions = multiprocessing.Value('q', 0) # number of positions evaluated
+        self.process = None
+
+    def start(self):
+        # start the server process, do this before starting the workers
+        self.process = multiprocessing.Process(target = serve, daemon = True,
+            args = (self.model_loader, self.requests, self.responses, self.inputs.name, self.results.name, self.clients,
+                    self.slot_positions, self.outputs, self.max_batch_size, self.max_wait_us, self.batches, self.positions))
+        self.process.start()
+
+    def stop(self):
+        # stop the server process and free the shared memory
+        if (self.process != None):
+            self.requests.put(None)
+            self.process.join()
+            self.process = None
+        self.inputs.close()
+        self.inputs.unlink()
+        self.results.close()
+        self.results.unlink()
+
+    def client(self, i):
+        # connection for worker number i, pass it to the worker process
+        return InferenceClient(i, self.inputs.name, self.results.name, self.slot_positions, self.outputs,
+                               self.requests, self.responses[i])
+
+    def mean_batch_size(self):
+        # average number of positions per model.predict call so far
+        if (self.batches.value == 0):
+            return 0
+        return self.positions.value / self.batches.value
+
+
+def serve(model_loader, requests, responses, inputs_name, results_name, clients, slot_positions, outputs,
+          max_batch_size, max_wait_us, batches, positions):
+    # body of the server process
+    model = model_loader()
+    inputs_shm = shared_memory.SharedMemory(name = inputs_name)
+    results_shm = shared_memory.SharedMemory(name = results_name)
+    inputs = numpy.ndarray((clients, slot_positions, 243), dtype = numpy.int8, buffer = inputs_shm.buf)
+    results = numpy.ndarray((clients, slot_positions, outputs), dtype = numpy.float32, buffer = results_shm.buf)
+    running = True
+    while running:
+        request = requests.get()
+        if (request == None):
+            break
+        batch = [request]
+        total = request[1]
+        deadline = time.perf_counter() + max_wait_us / 1000000
+        while (total < max_batch_size):
+            wait = deadline - time.perf_counter()
+            if (wait <= 0):
+                break
+            try:
+                request = requests.get(timeout = wait)
+            except queue.Empty:
+                break
+            if (request == None):
+                running = False
+                break
+            batch.append(request)
+            total += request[1]
+
+        codes = numpy.concatenate([inputs[c, :n] for c, n in batch])
+        output = model.predict(boards_to_matrix(codes), verbose = 0)
+        i = 0
+        for c, n in batch:
+            results[c, :n] = output[i:i + n]
+            i += n
+            responses[c].put(n)
+        batches.value += 1
+        positions.value += total
+    del inputs, results
+    inputs_shm.close()
+    results_shm.close()
+
+
+class InferenceClient:
+    """ the worker side of an InferenceServer, made by InferenceServer.client
+        predict_codes sends positions to the server and waits for the outputs
+    """
+    def __init__(self, number, inputs_name, results_name, slot_positions, outputs, requests, response):
+        self.number = number
+        self.inputs_name = inputs_name
+        self.results_name = results_name
+        self.slot_positions = slot_positions
+        self.outputs = outputs
+        self.requests = requests
+        self.response = response
+        self.inputs = None # attached on the first request, in the worker process
+
+    def attach(self):
+        self.inputs_shm = shared_memory.SharedMemory(name = self.inputs_name)
+        self.results_shm = shared_memory.SharedMemory(name = self.results_name)
+        self.inputs = numpy.ndarray((self.slot_positions, 243), dtype = numpy.int8, buffer = self.inputs_shm.buf,
+                                    offset = self.number * self.slot_positions * 243)
+        self.results = numpy.ndarray((self.slot_positions, self.outputs), dtype = numpy.float32, buffer = self.results_shm.buf,
+                                     offset = self.number * self.slot_positions * self.outputs * 4)
+
+    def __getstate__(self):
+        # the shared memory is attached again by the process that unpickles the client
+        state = self.__dict__.copy()
+        for name in ("inputs_shm", "results_shm", "results"):
+            state.pop(name, None)
+        state["inputs"] = None
+        return state
+
+    def predict_codes(self, codes):
+        # model outputs for positions given as cell codes (an (N, 243) array from encode_boards), an (N, outputs) array
+        if (self.inputs is None):
+            self.attach()
+        output = numpy.zeros((len(codes), self.outputs), dtype = numpy.float32)
+        for start in range(0, len(codes), self.slot_positions):
+            n = min(self.slot_positions, len(codes) - start)
+            self.inputs[:n] = codes[start:start + n]
+            self.requests.put((self.number, n))
+            self.response.get()
+            output[start:start + n] = self.results[:n]
+        return output
+
+
+class ServerEvaluator:
+    # MCTS_Player evaluator that asks an InferenceServer, same values as KerasEvaluator in Player
+    def __init__(self, client):
+        self.client = client
+
+    def evaluate(self, board, moves, team):
+        return self.evaluate_batch([(board, moves, team)])[0]
+
+    def evaluate_batch(self, positions):
+        output = self.client.predict_codes(encode_boards([p[0] for p in positions]))
+        return [(uniform_priors(moves), team * white_value(out)) for (board, moves, team), out in zip(positions, output)]
@@ -2,6 +2,7 @@ from Letter import*
 from Symbol import*
 from Hoigi_Pieces import*
 from Hoigi_Board import*
+from Hoigi_Bitboard import*
 from Player import*
 import pygame
 import time
@@ -553,6 +554,8 @@ def process_move(board, player):
 def run1():
     move_limit = 300
     board1 = board(9,9,3)
+    #board1 = ArrayBoard(9,9,3)  # same game on the flat array backend, much cheaper to copy
+    #board1 = BitBoard(9,9,3)    # same game on the bitboard backend
     winner = 0
     move_history = []
     numBranch = 0
@@ -594,6 +597,7 @@ def run1():
             print("winner is black")
             break
         
+        board1.changeturn()
         move_limit -= 1
         
     
@@ -635,4 +639,5 @@ def test_wrapper():
     print("Average Runtime of a game is ", totalTime / n)
     print("---------------------------")
 
-test_wrapper()
\ No newline at end of file
+if __name__ == "__main__":
+    test_wrapper()
\ No newline at end of file
@@ -0,0 +1,118 @@
+from Hoigi_Board import *
+from NumpyNN import ACTIVATIONS
+
+# efficiently updatable network (NNUE): the first layer is a Dense layer over the 18 x 9x9x3 BoardToMatrix inputs,
+# a move changes only two or three of those inputs, so each board keeps the first layer's sum (its accumulator)
+# and place() adds and subtracts the weight rows of the inputs that change
+# only the small layers after it run for every evaluation
+#
+# the Keras model to train for it is Input(18,9,9,3) -> Flatten -> Dense(hidden) -> more Dense layers,
+# the last one a softmax over (draw, white wins, black wins) like SL_NN.py, or a single tanh value for white
+# saved with export_model in NumpyNN.py
+
+NNUE_SCALE = 1000 # alpha-beta score of a position the network values at 1 (a sure win for white)
+
+class NNUENetwork:
+    """ network with an incrementally updated first layer
+        rows[(code + 9) * 243 + cell] is the first layer weight row of a piece with code team * type on cell,
+        the row of code 0 (empty) is zero, the same indexing as ZOBRIST_KEYS and PIECE_SQUARE_VALUE
+        kernel is the first layer in the BoardToMatrix input order (plane * 243 + cell), layers the ones after it
+    """
+    def __init__(self, kernel, bias, activation, layers):
+        self.kernel = numpy.asarray(kernel, dtype = numpy.float32)
+        self.bias = numpy.asarray(bias, dtype = numpy.float64)
+        self.activation = ACTIVATIONS[activation]
+        self.layers = [(numpy.asarray(k, dtype = numpy.float32), numpy.asarray(b, dtype = numpy.float32), ACTIVATIONS[a])
+                       for k, b, a in layers]
+        # the accumulator is summed in float64, so adding and taking back moves for a whole game does not drift
+        self.rows = numpy.zeros((19 * 243, len(self.bias)), dtype = numpy.float64)
+        for code in range(-9, 10):
+            if (code != 0):
+                plane = PLANE_OF_CODE[code + 9]
+                self.rows[(code + 9) * 243:(code + 10) * 243] = self.kernel[plane * 243:(plane + 1) * 243]
+
+    @classmethod
+    def from_npz(cls, path):
+        # network from a model saved with export_model, it has to start with Flatten and a Dense layer
+        data = numpy.load(path)
+        descriptions = [str(d) for d in data["layers"]]
+        if (descriptions[:1] != ["flatten"] or len(descriptions) < 2 or not descriptions[1].startswith("dense")):
+            raise ValueError("an NNUE model starts with Flatten and Dense, not " + str(descriptions[:2]))
+        dense = []
+        for n, description in enumerate(descriptions):
+            if (description == "flatten"):
+                continue
+            if (not description.startswith("dense")):
+                raise ValueError("layer " + description + " is not supported after the first layer of an NNUE model")
+            kernel = data["kernel" + str(n)].astype(numpy.float32)
+            if ("scale" + str(n)) in data:
+                kernel = kernel * data["scale" + str(n)]
+            dense.append((kernel, data["bias" + str(n)], description.split(":")[1]))
+        return cls(dense[0][0], dense[0][1], dense[0][2], dense[1:])
+
+    @classmethod
+    def random(cls, hidden = 128, seed = 0):
+        # untrained network of the default shape (4374 -> hidden -> 32 -> 3), for tests and speed measurements
+        rng = numpy.random.default_rng(seed)
+        return cls(rng.normal(0, 0.05, (18 * 243, hidden)), numpy.zeros(hidden), "relu",
+                   [(rng.normal(0, 0.1, (hidden, 32)), numpy.zeros(32), "relu"),
+                    (rng.normal(0, 0.1, (32, 3)), numpy.zeros(3), "softmax")])
+
+    def refresh(self, board):
+        # accumulator of a board computed from scratch
+        codes = encode_boards([board])[0].astype(numpy.intp)
+        return self.bias + self.rows[(codes + 9) * 243 + numpy.arange(243)].sum(axis = 0)
+
+    def accumulators(self, codes):
+        # accumulators of many positions given as codes from encode_boards, an (N, hidden) array
+        # one matrix product over the BoardToMatrix inputs, a gather of rows would need 243 rows per position in memory
+        x = boards_to_matrix(codes).reshape(len(codes), -1)
+        return self.bias + numpy.matmul(x, self.kernel)
+
+    def output(self, accumulator):
+        # output of the network for a position with this accumulator, or for an (N, hidden) array of them
+        x = self.activation(accumulator.astype(numpy.float32))
+        for kernel, bias, activation in self.layers:
+            x = activation(numpy.matmul(x, kernel) + bias)
+        return x
+
+    def value(self, accumulator):
+        # how good the position is for white, from -1 to 1
+        return float(self.values(accumulator))
+
+    def values(self, accumulators):
+        # value of every accumulator in an (N, hidden) array, or of a single one
+        out = self.output(accumulators)
+        if (out.shape[-1] == 3):
+            return out[..., 1] - out[..., 2]
+        return out[..., 0]
+
+    def predict(self, x, verbose = 0):
+        # outputs for a batch of BoardToMatrix inputs computed without accumulators, like a Keras model
+        x = numpy.asarray(x, dtype = numpy.float32).reshape(len(x), -1)
+        x = self.activation(numpy.matmul(x, self.kernel) + self.bias.astype(numpy.float32))
+        for kernel, bias, activation in self.layers:
+            x = activation(numpy.matmul(x, kernel) + bias)
+        return x
+
+
+def attach_nnue(board, network):
+    # give board an accumulator of network, place() keeps it up to date from now on
+    # network = None takes it away again
+    board.nnue = network
+    board.accumulator = None if network is None else network.refresh(board)
+
+
+class NNUEEvaluator:
+    # MCTS_Player evaluator (see HeuristicEvaluator in Player) with uniform priors and the value of an NNUENetwork
+    # the first board it sees gets an accumulator, the boards searched from it inherit it through place()
+    def __init__(self, network):
+        self.network = network
+
+    def evaluate(self, board, moves, team):
+        if (board.nnue is not self.network):
+            attach_nnue(board, self.network)
+        return uniform_priors(moves), team * self.network.value(board.accumulator)
+
+    def evaluate_batch(self, positions):
+        return [self.evaluate(board, moves, team) for board, moves, team in positions]
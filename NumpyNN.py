@@ -0,0 +1,119 @@
+import numpy
+import os
+
+# the value network of SL_NN.py run with NumPy only, so search processes do not have to import TensorFlow
+# export_model saves the weights of a trained Keras model to an .npz file, NumpyModel loads it and computes
+# the same outputs with predict(x), like the Keras model, so it can be used by KerasEvaluator and InferenceServer
+# supported layers: Dense (on the last axis, like Keras), Flatten and Dropout (does nothing at inference)
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: numpy.maximum(x, 0),
+    "sigmoid": lambda x: 1 / (1 + numpy.exp(-x)),
+    "tanh": numpy.tanh,
+    "softmax": lambda x: softmax(x),
+}
+
+def softmax(x):
+    e = numpy.exp(x - x.max(axis = -1, keepdims = True))
+    return e / e.sum(axis = -1, keepdims = True)
+
+WEIGHT_CHUNK_ROWS = 1024 # rows of a float16 or int8 kernel that predict converts to float32 at a time
+
+def export_model(model, path, dtype = "float32", x = None, tolerance = 1e-2):
+    # save the layers of a Keras model to path (.npz)
+    # dtype "float32" keeps the weights as trained, "float16" halves their size,
+    # "int8" stores every column of a weight matrix as 8-bit integers times a float scale (a quarter of the size)
+    # the rounding adds up over wide layers, so a float16 or int8 model is checked with verify_model on the inputs x:
+    # when its outputs are more than tolerance away from the model's, the file is deleted and ValueError is raised
+    # return the list of layer descriptions that was saved
+    if (dtype not in ("float32", "float16", "int8")):
+        raise ValueError("unknown weight type " + str(dtype))
+    if (dtype != "float32" and x is None):
+        raise ValueError("the " + dtype + " weights have to be checked against the model, pass some inputs x")
+    layers = []
+    arrays = {}
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if (kind == "Dense"):
+            n = len(layers)
+            kernel, bias = layer.get_weights()
+            if (dtype == "int8"):
+                scale = numpy.abs(kernel).max(axis = 0) / 127
+                scale[scale == 0] = 1
+                arrays["kernel" + str(n)] = numpy.round(kernel / scale).astype(numpy.int8)
+                arrays["scale" + str(n)] = scale.astype(numpy.float32)
+            else:
+                arrays["kernel" + str(n)] = kernel.astype(dtype)
+            arrays["bias" + str(n)] = bias.astype(numpy.float32)
+            layers.append("dense:" + layer.activation.__name__)
+        elif (kind == "Flatten"):
+            layers.append("flatten")
+        elif (kind in ("Dropout", "InputLayer")):
+            continue
+        else:
+            raise ValueError("layer " + kind + " is not supported by NumpyModel")
+    numpy.savez(path, layers = numpy.array(layers), **arrays)
+    if (x is not None):
+        difference, matches = verify_model(model, NumpyModel(path), x, tolerance)
+        if (not matches):
+            os.remove(path)
+            raise ValueError("the " + dtype + " weights change the outputs by up to " + str(difference) +
+                             ", more than " + str(tolerance) + ", the model was not saved")
+    return layers
+
+
+class NumpyModel:
+    """ forward pass of a model saved by export_model
+        int8 and float16 weights stay in that type in memory, predict multiplies by WEIGHT_CHUNK_ROWS rows of them
+        at a time in float32 (see matmul_rows), the outputs are float32
+    """
+    def __init__(self, path):
+        data = numpy.load(path)
+        self.layers = []
+        for n, description in enumerate(data["layers"]):
+            description = str(description)
+            if (description == "flatten"):
+                self.layers.append(("flatten", None, None, None, None))
+                continue
+            activation = description.split(":")[1]
+            if (activation not in ACTIVATIONS):
+                raise ValueError("activation " + activation + " is not supported by NumpyModel")
+            scale = data["scale" + str(n)] if ("scale" + str(n)) in data else None
+            self.layers.append(("dense", data["kernel" + str(n)], data["bias" + str(n)], scale, ACTIVATIONS[activation]))
+
+    def predict(self, x, verbose = 0, batch_size = None):
+        # outputs for a batch of inputs, the arguments after x are accepted for the same call as a Keras model
+        x = numpy.asarray(x, dtype = numpy.float32)
+        for kind, kernel, bias, scale, activation in self.layers:
+            if (kind == "flatten"):
+                x = x.reshape(len(x), -1)
+                continue
+            if (kernel.dtype == numpy.float32):
+                x = numpy.matmul(x, kernel)
+            else:
+                x = matmul_rows(x, kernel)
+            if (scale is not None): # int8: the products of every column are multiplied by its scale afterwards
+                x *= scale
+            x = activation(x + bias)
+        return x
+
+    def __call__(self, x):
+        return self.predict(x)
+
+
+def matmul_rows(x, kernel):
+    # x @ kernel in float32 for a float16 or int8 kernel, without a float32 copy of the whole kernel:
+    # only WEIGHT_CHUNK_ROWS of its rows are converted at a time and their products are added up
+    out = numpy.matmul(x[..., :WEIGHT_CHUNK_ROWS], kernel[:WEIGHT_CHUNK_ROWS].astype(numpy.float32))
+    for start in range(WEIGHT_CHUNK_ROWS, len(kernel), WEIGHT_CHUNK_ROWS):
+        out += numpy.matmul(x[..., start:start + WEIGHT_CHUNK_ROWS], kernel[start:start + WEIGHT_CHUNK_ROWS].astype(numpy.float32))
+    return out
+
+
+def verify_model(model, numpy_model, x, tolerance = 1e-4):
+    # compare the outputs of a Keras model and its NumpyModel on the inputs x
+    # return (largest absolute difference, True if it is within tolerance)
+    expected = model.predict(x, verbose = 0)
+    difference = float(numpy.abs(expected - numpy_model.predict(x)).max())
+    return difference, difference <= tolerance
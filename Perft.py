@@ -0,0 +1,96 @@
+from Main import *
+import argparse
+
+# Perft: count the leaf nodes of the move tree to a fixed depth
+# the counts check that a move generator is correct (every backend must give the same numbers)
+# and the time taken measures how fast it is
+# positions are expanded even after a king has been captured, perft tests move generation, not the game rules
+
+SETUPS = {"standard": StandardSetup, "simplified": SimplifiedSetup, "simple": simplesetup}
+
+def reference_codes(board, team):
+    # moves of a team from the per-type methods of Piece, packed into integers
+    # this is the reference every faster move generator is compared against
+    movelist = []
+    squares = board.squares
+    for p in board.allpieces():
+        if (p[0].team == team):
+            movelist += [encode_move(m) for m in p[0].reference_moves(squares, p[1])]
+    return movelist
+
+def perft(board, depth, team, reference = False):
+    # number of leaf nodes depth moves below the position, team is the side to move
+    # reference = True uses reference_codes instead of the board's own move generator
+    if (depth == 0):
+        return 1
+    moves = reference_codes(board, team) if reference else board.legal_codes(team)
+    if (depth == 1):
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.make_move(move)
+        nodes += perft(board, depth - 1, -team, reference)
+        board.unmake_move()
+    return nodes
+
+def divide(board, depth, team, reference = False):
+    # perft split by root move, return a dictionary of PGN move string -> leaf count
+    # a move generated twice is counted under the same string twice
+    result = {}
+    moves = reference_codes(board, team) if reference else board.legal_codes(team)
+    for move in moves:
+        board.make_move(move)
+        s = move_to_pgn(move)
+        result[s] = result.get(s, 0) + perft(board, depth - 1, -team, reference)
+        board.unmake_move()
+    return result
+
+def RunPerft(setup = "standard", backend = "array", depth = 2, team = 1, show_divide = False):
+    # run perft on a start position and print the count and the speed
+    # backend is a name in BOARD_BACKENDS, or "reference" for the Piece.reference_moves generator on board
+    # return the number of leaf nodes, or the divide dictionary when show_divide is True
+    reference = (backend == "reference")
+    b = new_board("list" if reference else backend)
+    SETUPS[setup](b)
+    start = time.time()
+    if (show_divide):
+        result = divide(b, depth, team, reference)
+        nodes = sum(result.values())
+    else:
+        result = perft(b, depth, team, reference)
+        nodes = result
+    totalTime = time.time() - start
+    if (show_divide):
+        for s in sorted(result):
+            print(s, result[s])
+    print("perft(", depth, ") of", setup, "on", backend, "=", nodes, "nodes in", round(totalTime, 3), "s,",
+          round(nodes / max(totalTime, 1e-9)), "nodes/sec")
+    return result
+
+def PerftCompare(setup = "standard", depth = 2, team = 1):
+    # run divide on every backend and on the reference generator, report whether all counts agree
+    results = {}
+    for backend in ["reference"] + list(BOARD_BACKENDS):
+        results[backend] = RunPerft(setup, backend, depth, team, show_divide = True)
+    agree = True
+    for backend in BOARD_BACKENDS:
+        if (results[backend] != results["reference"]):
+            agree = False
+            print(backend, "differs from the reference in:",
+                  sorted(s for s in set(results[backend]) | set(results["reference"])
+                         if results[backend].get(s) != results["reference"].get(s)))
+    print("all backends agree with the reference" if agree else "backends DISAGREE with the reference")
+    return agree
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Count move tree leaf nodes (perft) for Hoigi start positions")
+    parser.add_argument("depth", type = int, nargs = "?", default = 2)
+    parser.add_argument("--setup", choices = list(SETUPS), default = "standard")
+    parser.add_argument("--backend", choices = ["reference"] + list(BOARD_BACKENDS), default = "array")
+    parser.add_argument("--team", type = int, choices = [1, -1], default = 1, help = "side to move, 1 = white, -1 = black")
+    parser.add_argument("--divide", action = "store_true", help = "print the count of every root move")
+    parser.add_argument("--compare", action = "store_true", help = "check every backend against the reference generator")
+    args = parser.parse_args()
+    if (args.compare):
+        sys.exit(0 if PerftCompare(args.setup, args.depth, args.team) else 1)
+    RunPerft(args.setup, args.backend, args.depth, args.team, args.divide)
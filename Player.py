@@ -1,6 +1,11 @@
 import random
+import time
+import heapq
+import multiprocessing
 import numpy
-from copy import deepcopy
+from Hoigi_Board import *
+from TranspositionTable import *
+from NNUE import *
 
 class Player:
     def __init__(self, team):
@@ -55,15 +60,18 @@ class Minimax_Player(Player):
         
         for move in self.moves:
             
-            # make copy of the board position so we are not changing the actual board when trying moves
-            tempboard = deepcopy(board)
-            tempboard.push(move)
+            # play the move on the board and take it back afterwards, so the actual position is left unchanged
+            board.make_move(move)
             
             if n > 0:  # look ahead n moves opponent player plays
-                temp_best_move = self.min_maxN(tempboard,n-1)
-                tempboard.push(temp_best_move)
+                temp_best_move = self.min_maxN(board,n-1)
+                board.make_move(temp_best_move)
 
-            scores.append(self.eval_board(tempboard))   # score corresponse to the move indices
+            scores.append(self.eval_board(board))   # score corresponse to the move indices
+
+            if n > 0:
+                board.unmake_move()
+            board.unmake_move()
             
 
         if self.team == 1:
@@ -81,154 +89,83 @@ class Minimax_Player(Player):
         return bestmove
         
 
+MAX_PLY = 64 # deepest ply the killer move table has room for
+DELTA_MARGIN = 30 # most a capture can change the position part of the score, used for delta pruning
+ASPIRATION_WINDOW = 20 # half width of the root window around the score of the previous iteration
+NNUE_ASPIRATION_WINDOW = 50 # the same for NNUE scores, which run from -NNUE_SCALE to NNUE_SCALE
+NULL_MOVE_REDUCTION = 2 # how much shallower the search after a null move is
+NULL_MOVE_MIN_PIECES = 5 # no null move when the side to move has fewer pieces, passing may then really be best
+LMR_FULL_MOVES = 3 # moves searched to full depth in every node before late move reductions start
+LMR_MIN_DEPTH = 3 # no reductions closer to the horizon than this
+
+class SearchTimeout(Exception):
+    # raised inside the search when the time or node budget of a move runs out
+    pass
+
 class MinimaxAlphaBeta_Player(Player): 
-    def __init__(self, team, depth):
+    def __init__(self, team, depth, tt_size_mb = 16, time_limit = None, node_limit = None, quiescence_depth = 4, top_k = 3,
+                 null_move = False, lmr = False, temperature = None, workers = 1, eval_cache = None, nnue = None):
         super().__init__(team)
-        self.MAX = numpy.Inf  #initialize to be positive infinity
-        self.MIN = numpy.NINF #initialize to be negative infinity
-        self.depth = depth # number of moves we look ahead
-        # flip the position values for black because black is on the other side of the board
-        # [y,x,z]
-        self.whitePawnEval = [
-[[-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10], [-10,-10,-10]],
-[[ -7, -8, -9], [ -7, -8, -9], [ -7, -8, -9], [ -7, -8, -9], [ -6, -7, -8], [ -7, -8, -9], [ -7, -8, -9], [ -7, -8, -9], [ -7, -8, -9]],
-[[ -4, -5, -6], [ -3, -4, -5], [ -2, -3, -4], [ -1, -2, -3], [  0, -1, -2], [ -1, -2, -3], [ -2, -3, -4], [ -3, -4, -5], [ -4, -5, -6]],
-[[  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  5,  4,  3], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1]],
-[[  6,  5,  4], [  7,  6,  5], [  8,  7,  6], [  9,  8,  7], [ 10,  9,  8], [  9,  8,  7], [  8,  7,  6], [  7,  6,  5], [  0,  0,  4]],
-[[  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1]],
-[[  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0]],
-[[  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0]],
-[[  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0]]]
-        self.blackPawnEval = list(reversed(self.whitePawnEval)) 
-        self.whiteKingEval = [
-[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
-[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
-[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
-[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
-[[0,0,-3.0], [0,0,-4.0], [0,0,-4.0], [0,0,-5.0], [0,0,-6.0], [0,0,-5.0], [0,0,-4.0], [0,0,-4.0], [0,0,-3.0]],
-[[0,0,-2.0], [0,0,-3.0], [0,0,-3.0], [0,0,-4.0], [0,0,-5.0], [0,0,-4.0], [0,0,-3.0], [0,0,-3.0], [0,0,2.0]],
-[[0,0,-1.0], [0,0,-2.0], [0,0,-2.0], [0,0,-3.0], [0,0,-4.0], [0,0,-3.0], [0,0,-2.0], [0,0,-2.0], [0,0,-1.0]],
-[[0,0,2.0],  [0,0,1.0], [0,0, 1.0], [0,0, 0], [0,0, 0],  [0,0,0],  [0,0,1.0],  [0,0,1.0],  [0,0,2.0]],
-[[0,0,3.0],  [0,0,2.0],  [0,0,1.0], [0,0, 1.0],  [0,0,0],  [0,0,1.0],  [0,0,1.0],  [0,0,2.0],  [0,0,3.0]]]
-        self.blackKingEval = list(reversed(self.whiteKingEval))
-        self.whiteFortressEval = [
-[[  0,  0, -8], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -7], [  0,  0, -8]],
-[[  0,  0, -7], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -6], [  0,  0, -7]],
-[[  0,  0, -6], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -4], [  0,  0, -6]],
-[[  0,  0, -5], [  0,  0, -4], [  0,  0, -3], [  0,  0, -3], [  0,  0, -3], [  0,  0, -3], [  0,  0, -4], [  0,  0, -4], [  0,  0, -5]],
-[[  0,  0, -2], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -1], [  0,  0, -2]],
-[[  0,  0, -1], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  5], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0, -1]],
-[[  0,  0,  0], [  0,  0,  4], [  0,  0,  5], [  0,  0,  5], [  0,  0,  5], [  0,  0,  5], [  0,  0,  5], [  0,  0,  4], [  0,  0,  0]],
-[[  0,  0, -1], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0,  4], [  0,  0, -1]],
-[[  0,  0, -2], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0,  3], [  0,  0, -2]]]
-        self.blackFortressEval = list(reversed(self.whiteFortressEval))
-        self.whiteArcherEval = [
-[[ -6, -7, -8], [ -5, -6, -7], [ -4, -5, -6], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -4, -5, -6], [ -5, -6, -7], [ -6, -7, -8]],
-[[ -4, -5, -6], [ -3, -4, -5], [ -2, -3, -4], [ -1, -2, -3], [  0, -1, -2], [ -1, -2, -3], [ -2, -3, -4], [ -3, -4, -5], [ -4, -5, -6]],
-[[ -4, -5, -6], [ -2, -3, -4], [ -1, -2, -3], [  0,  0, -1], [  1, 0,  -1], [  0,  0, -1], [ -1, -2, -3], [ -2, -3, -4], [ -4, -5, -6]],
-[[  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  5,  4,  3], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1]],
-[[  6,  5,  4], [  7,  6,  5], [  8,  7,  6], [  9,  8,  7], [ 10,  9,  8], [  9,  8,  7], [  8,  7,  6], [  7,  6,  5], [  6,  5,  4]],
-[[  3,  2,  1], [  3,  2,  1], [  6,  5,  4], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  6,  5,  4], [  3,  2,  1], [  3,  2,  1]],
-[[  1,  0,  0], [  2,  1,  0], [  3,  2,  1], [  5,  4,  3], [  6,  5,  4], [  5,  4,  3], [  3,  2,  1], [  2,  1,  0], [  1,  0,  0]],
-[[  0,  0,  0], [  2,  1,  0], [  2,  1,  0], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  2,  1,  0], [  1,  0,  0], [  0,  0,  0]],
-[[  0,  0,  0], [  0,  0,  0], [  1,  0,  0], [  1,  0,  0], [  1,  0,  0], [  1,  0,  0], [  1,  0,  0], [  0,  0,  0], [  0,  0,  0]]]
-        self.blackArcherEval = list(reversed(self.whiteArcherEval))
-        self.whiteLieutenantEval = [
-[[ -7, -8, -9], [ -7, -8, -9], [ -6, -7, -8], [ -6, -7, -8], [ -6, -7, -8], [ -6, -7, -8], [ -6, -7, -8], [ -7, -8, -9], [ -7, -8, -9]],
-[[ -4, -5, -6], [ -4, -5, -6], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -4, -5, -6], [ -4, -5, -6]],
-[[ -3, -4, -5], [ -3, -4, -5], [ -2, -3, -4], [ -2, -3, -4], [ -2, -3, -4], [ -2, -3, -4], [ -2, -3, -4], [ -3, -4, -5], [ -3, -4, -5]],
-[[  1,  0, -1], [  1,  0, -1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  1,  0, -1], [  1,  0, -1]],
-[[  1,  0, -1], [  2,  1,  0], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  4,  3,  2], [  1,  0, -1]],
-[[  2,  1,  0], [  3,  2,  1], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  3,  2,  1], [  2,  1,  0]],
-[[  1,  0,  0], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0,  0]],
-[[ -1,  0,  0], [  0,  0,  0], [  1,  0,  0], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  1,  0,  0], [  1,  0,  0], [ -1,  0,  0]],
-[[ -2, -1,  0], [  0,  0, -1], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0, -1], [ -2, -1,  0]]]
-        self.blackLieutenantEval = list(reversed(self.whiteLieutenantEval))
-        self.whiteGeneralEval = [
-[[ -6, -7, -8], [ -6, -7, -8], [ -5, -6, -7], [ -5, -6, -7], [ -5, -6, -7], [ -5, -6, -7], [ -5, -6, -7], [ -6, -7, -8], [ -6, -7, -8]],
-[[ -4, -5, -6], [ -4, -5, -6], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -3, -4, -5], [ -4, -5, -6]],
-[[ -2, -3, -4], [ -2, -3, -4], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [ -2, -3, -4], [ -3, -4, -5]],
-[[  1,  0, -1], [  3,  2,  1], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  3,  2,  1], [  1,  0, -1]],
-[[  2,  1,  0], [  4,  3,  2], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  4,  3,  2], [  2,  1,  0]],
-[[  2,  1,  0], [  3,  2,  1], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  6,  5,  4], [  3,  2,  1], [  2,  1,  0]],
-[[  1,  0,  0], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0,  0]],
-[[ -1,  0,  0], [  0,  0,  0], [  1,  0,  0], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  1,  0,  0], [  1,  0,  0], [ -1,  0,  0]],
-[[ -2, -1,  0], [  0,  0, -1], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0,  0], [  0,  0, -1], [ -2, -1,  0]]]
-        self.blackGeneralEval = list(reversed(self.whiteGeneralEval))
-        self.whiteCaptainEval = [
-[[ -3, -5, -7], [ -3, -5, -7], [ -2, -4, -6], [ -2, -4, -6], [ -2, -4, -6], [ -2, -4, -6], [ -2, -4, -6], [ -3, -5, -7], [ -3, -5, -7]],
-[[ -2, -4, -6], [ -2, -4, -6], [ -1, -3, -5], [ -1, -3, -5], [ -1, -3, -5], [ -1, -3, -5], [ -1, -3, -5], [ -2, -4, -6], [ -2, -4, -6]],
-[[ -1, -3, -5], [ -1, -3, -5], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [  0, -1, -2], [ -1, -3, -5], [ -1, -3, -5]],
-[[  1,  0, -1], [  1,  0, -1], [  2,  0, -2], [  2,  0, -2], [  2,  0, -2], [  2,  0, -2], [  2,  0, -2], [  1,  0, -1], [  1,  0, -1]],
-[[  2,  1,  0], [  2,  1,  0], [  4,  2,  0], [  6,  4,  2], [  7,  5,  3], [  6,  4,  2], [  4,  2,  0], [  2,  1,  0], [  2,  0, -2]],
-[[  2,  1,  0], [  4,  2,  0], [  4,  2,  0], [  6,  4,  2], [  6,  4,  2], [  6,  4,  2], [  4,  2,  0], [  4,  2,  0], [  2,  1,  0]],
-[[  2,  1,  0], [  2,  1,  0], [  4,  2,  0], [  4,  3,  2], [  4,  3,  2], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  2,  1,  0]],
-[[  1,  0, -1], [  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1], [  1,  0, -1]],
-[[  1,  0, -1], [  1,  0, -1], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  1,  0, -1], [  1,  0, -1]]]
-        self.blackCaptainEval = list(reversed(self.whiteCaptainEval))
-        self.whiteCannonEval = [
-[[ -7, -8, -9], [ -6, -7, -8], [ -5, -6, -7], [ -4, -5, -6], [ -4, -5, -6], [ -4, -5, -6], [ -5, -6, -7], [ -6, -7, -8], [ -7, -8, -9]],
-[[ -6, -7, -8], [ -5, -6, -7], [ -4, -5, -6], [ -2, -3, -4], [ -2, -3, -4], [ -2, -3, -4], [ -4, -5, -6], [ -4, -5, -6], [ -6, -7, -8]],
-[[ -4, -5, -6], [ -2, -3, -4], [ -1, -2, -3], [ -1, -2, -3], [  1,  0, -1], [ -1, -2, -3], [ -1, -2, -3], [ -2, -3, -4], [ -4, -5, -6]],
-[[  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  5,  4,  3], [  4,  3,  2], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1]],
-[[  6,  5,  4], [  7,  6,  5], [  8,  7,  6], [  9,  8,  7], [ 10,  9,  8], [  9,  8,  7], [  8,  7,  6], [  7,  6,  5], [  6,  5,  4]],
-[[  3,  2,  1], [  3,  2,  1], [  6,  5,  4], [  7,  6,  5], [  7,  6,  5], [  7,  6,  5], [  6,  5,  4], [  3,  2,  1], [  3,  2,  1]],
-[[  2,  1,  0], [  3,  2,  1], [  4,  3,  2], [  5,  4,  3], [  6,  5,  4], [  4,  3,  2], [  3,  2,  1], [  3,  2,  1], [  2,  1,  0]],
-[[  1,  0, -1], [  1,  0, -1], [  2,  1,  0], [  3,  2,  1], [  3,  2,  1], [  3,  2,  1], [  2,  1,  0], [  1,  0, -1], [  1,  0, -1]],
-[[  0, -1, -2], [  1,  0, -1], [  1,  0, -1], [  2,  1,  0], [  2,  1,  0], [  2,  1,  0], [  1,  0, -1], [  1,  0, -1], [  0, -1, -2]]]
-        self.blackCannonEval = list(reversed(self.whiteCannonEval))
-        self.whiteMusketeerEval = [
-[[-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8], [-10, -9, -8]],
-[[ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9], [ -5, -7, -9]],
-[[ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7], [ -3, -5, -7]],
-[[  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1], [  3,  1, -1]],
-[[ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6]],
-[[ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6], [ 10,  8,  6]],
-[[  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3], [  7,  5,  3]],
-[[  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1], [  5,  3,  1]],
-[[  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0], [  4,  2,  0]]]
-        self.blackMusketeerEval = list(reversed(self.whiteMusketeerEval))
-        """ Backup Position Values
-            [-4.0, -5.0, -5.0, -6.0, -7.0, -6.0, -5.0, -5.0, -4.0],
-            [-4.0, -5.0, -5.0, -6.0, -7.0, -6.0, -5.0, -5.0, -4.0],
-            [-4.0, -5.0, -5.0, -6.0, -7.0, -6.0, -5.0, -5.0, -4.0],
-            [-4.0, -5.0, -5.0, -6.0, -7.0, -6.0, -5.0, -5.0, -4.0],
-            [-3.0, -4.0, -4.0, -5.0, -6.0, -5.0, -4.0, -4.0, -3.0],
-            [-2.0, -3.0, -3.0, -4.0, -5.0, -4.0, -3.0, -3.0, -2.0],
-            [-1.0, -2.0, -2.0, -3.0, -4.0, -3.0, -2.0, -2.0, -1.0],
-            [ 2.0,  1.0,  1.0,  0,  0,  0,  1.0,  1.0,  2.0],
-            [ 3.0,  2.0,  1.0,  1.0,  0,  1.0,  1.0,  2.0,  3.0]]
-[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
-[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
-[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
-[[0,0,-4.0], [0,0,-5.0], [0,0,-5.0], [0,0,-6.0], [0,0,-7.0], [0,0,-6.0], [0,0,-5.0], [0,0,-5.0], [0,0,-4.0]],
-[[0,0,-3.0], [0,0,-4.0], [0,0,-4.0], [0,0,-5.0], [0,0,-6.0], [0,0,-5.0], [0,0,-4.0], [0,0,-4.0], [0,0,-3.0]],
-[[0,0,-2.0], [0,0,-3.0], [0,0,-3.0], [0,0,-4.0], [0,0,-5.0], [0,0,-4.0], [0,0,-3.0], [0,0,-3.0], [0,0,2.0]],
-[[0,0,-1.0], [0,0,-2.0], [0,0,-2.0], [0,0,-3.0], [0,0,-4.0], [0,0,-3.0], [0,0,-2.0], [0,0,-2.0], [0,0,-1.0]],
-[[0,0,2.0],  [0,0,1.0], [0,0, 1.0], [0,0, 0], [0,0, 0],  [0,0,0],  [0,0,1.0],  [0,0,1.0],  [0,0,2.0]],
-[[0,0,3.0],  [0,0,2.0],  [0,0,1.0], [0,0, 1.0],  [0,0,0],  [0,0,1.0],  [0,0,1.0],  [0,0,2.0],  [0,0,3.0]]]
-        """
-        # Put the position values in dictionary for easy access
-        self.WhitePiecePositionValue = {1:self.whitePawnEval,
-                                        2:self.whiteKingEval,
-                                        3:self.whiteFortressEval,
-                                        4:self.whiteArcherEval,
-                                        5:self.whiteLieutenantEval,
-                                        6:self.whiteGeneralEval,
-                                        7:self.whiteCaptainEval,
-                                        8:self.whiteCannonEval,
-                                        9:self.whiteMusketeerEval}
-        self.BlackPiecePositionValue = {1:self.blackPawnEval,
-                                        2:self.blackKingEval,
-                                        3:self.blackFortressEval,
-                                        4:self.blackArcherEval,
-                                        5:self.blackLieutenantEval,
-                                        6:self.blackGeneralEval,
-                                        7:self.blackCaptainEval,
-                                        8:self.blackCannonEval,
-                                        9:self.blackMusketeerEval}
-        self.PiecePositionValue = {1:self.WhitePiecePositionValue, 
-                                  -1:self.BlackPiecePositionValue}
+        self.MAX = numpy.inf  #initialize to be positive infinity
+        self.MIN = -numpy.inf #initialize to be negative infinity
+        self.depth = depth # number of moves we look ahead, the deepest iteration when a budget is set
+        # budget of one move, search deeper and deeper until it runs out
+        # time_limit is in milliseconds, node_limit counts positions searched (gives the same result on every run)
+        # None means no limit, the search then always finishes depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.nodes = 0          # positions searched for the current move
+        self.deadline = None    # time.time() at which the current move must stop
+        self.can_stop = False   # the first iteration always finishes, so there is a move to play
+        self.completed_depth = 0 # depth of the last iteration that finished, for the current move
+        # at depth 0 keep playing captures (at most quiescence_depth of them) until the position is quiet
+        # 0 turns quiescence search off, the search then stops at depth 0 like a plain minimax
+        self.quiescence_depth = quiescence_depth
+        # the move played is picked at random from the top_k best moves, top_k = 1 always plays the best move
+        # only these top_k moves get an exact score, the other root moves only need to be shown worse (see search_root)
+        # temperature = None picks among them with equal chance, otherwise a move is picked with weight
+        # exp((score - best score) / temperature), so a small temperature prefers the best move
+        self.top_k = top_k
+        self.temperature = temperature
+        # null_move: let the side to move pass, if it is still winning after a shallower search the node is cut off
+        # lmr: search quiet moves late in the move order one move less deep, and again at full depth if they look good
+        self.null_move = null_move
+        self.lmr = lmr
+        self.pv = [] # principal variation of the last move: the packed moves both sides are expected to play
+        self.pv_table = [[] for i in range(MAX_PLY + 1)] # pv_table[ply] is the best line found from the node at ply
+        # move ordering: two quiet moves per ply that caused a cutoff (killers),
+        # and a score per packed move that grows every time the move causes a cutoff (history)
+        self.killers = [[0, 0] for i in range(MAX_PLY)]
+        self.history = {}
+        # results of searched positions, kept between moves, memory is capped at tt_size_mb
+        # workers > 1 searches with that many processes (Lazy SMP): workers - 1 helper processes search the same
+        # position at staggered depths and share the transposition table, so each finds more results already stored
+        # the helpers are started on the first move and run until close() is called
+        self.workers = workers
+        self.helpers = []
+        self.stop = None # Event set by the main process to stop the helpers, only a helper has one
+        self.root_results = [] # [score, move, pv] of every root move from the last search, best first
+        # an EvalCache in front of eval_board, None for no cache
+        # board.score is already cheap, the cache pays off once a costlier evaluation takes its place
+        self.eval_cache = eval_cache
+        # an NNUENetwork to evaluate positions with instead of board.score, None for board.score
+        # its scores are not in material units, so quiescence does not use delta pruning with it
+        # (PIECE_VALUE + DELTA_MARGIN says nothing about how much a capture can change them)
+        # and the aspiration window is NNUE_ASPIRATION_WINDOW
+        if (nnue is not None and eval_cache is not None and eval_cache.mirror):
+            raise ValueError("an NNUE network is not colour-antisymmetric, it cannot share a mirror EvalCache")
+        self.nnue = nnue
+        self.delta_pruning = nnue is None
+        self.aspiration_window = ASPIRATION_WINDOW if nnue is None else NNUE_ASPIRATION_WINDOW
+        if (workers > 1):
+            self.tt = SharedTranspositionTable(tt_size_mb)
+        else:
+            self.tt = TranspositionTable(tt_size_mb)
+        self.side_key = 0 # makes the hash of the root carry this player as the side to move
+        # position values live in Hoigi_Pieces, the boards keep a running score from the same tables
+        self.WhitePiecePositionValue = WhitePiecePositionValue
+        self.BlackPiecePositionValue = BlackPiecePositionValue
+        self.PiecePositionValue = PiecePositionValue
 
     def eval_board_backup(self, board):
         # Backup code for eval_board before re-designing the function
@@ -246,6 +183,35 @@ class MinimaxAlphaBeta_Player(Player):
         # representing how favorable the current board position is
         # positive means good for white, negative means good for black
         # return a float number 
+        # the board keeps this score up to date as pieces move, see PIECE_SQUARE_VALUE
+        if (self.eval_cache == None):
+            return self.static_eval(board)
+        key, sign = self.eval_cache.key(board, board.turn)
+        value = self.eval_cache.get(key)
+        if (value == None):
+            value = sign * self.static_eval(board)
+            self.eval_cache.put(key, value)
+        return sign * value
+
+    def eval_boards(self, boards):
+        # eval_board of many positions at once, without the eval cache, a list of scores
+        # boards is a list of boards, or their codes from encode_boards (positions stored for training, MCTS batches),
+        # the scores come from one NumPy gather over the piece-square table or the NNUE first layer
+        codes = boards if isinstance(boards, numpy.ndarray) else encode_boards(boards)
+        if (self.nnue is None):
+            return eval_boards(codes).tolist()
+        return [round(NNUE_SCALE * v) for v in self.nnue.values(self.nnue.accumulators(codes)).tolist()]
+
+    def static_eval(self, board):
+        # board.score, or the value of the NNUE network from the board's accumulator in whole score units
+        # (the search uses null windows of width 1, so scores stay integers)
+        if (self.nnue is None):
+            return board.score
+        return round(NNUE_SCALE * self.nnue.value(board.accumulator))
+
+    def eval_board_scan(self, board):
+        # same score as eval_board, added up piece by piece from the board
+        # slow, kept for checking the running score of a board
         totalscore = 0
         pieces = board.allpieces()
         #print("pieces = ", pieces)
@@ -254,69 +220,704 @@ class MinimaxAlphaBeta_Player(Player):
             self.PiecePositionValue[p[0].team][p[0].type][p[1][0]][p[1][1]][p[1][2]])
         return totalscore
 
-    def MinimaxAlphaBeta(self, depth, board, alpha, beta, maximizingplayer):
-        # requires that self.moves contains legal moves available for the current player
+    def mvv_lva(self, board, move):
+        # ordering score of a capture: most valuable victim first, then least valuable attacker
+        victim = PIECE_VALUE[abs(board.code_at(move & 255)) - 1]
+        attacker = PIECE_VALUE[abs(((move >> 16) & 31) - 9) - 1]
+        return 256 * victim - attacker
+
+    def order_moves(self, board, moves, tt_move, ply):
+        # sort packed moves so the ones most likely to cause a cutoff come first:
+        # the transposition table move, then captures by most valuable victim / least valuable attacker (MVV-LVA),
+        # then the two killer moves of this ply, then the other quiet moves by their history score
+        killers = self.killers[ply]
+        history = self.history
+        def key(move):
+            if (move == tt_move):
+                return 1 << 30
+            if (move & CAPTURE_FLAG):
+                return (1 << 28) + self.mvv_lva(board, move)
+            if (move == killers[0]):
+                return (1 << 27) + 1
+            if (move == killers[1]):
+                return 1 << 27
+            return history.get(move, 0)
+        return sorted(moves, key = key, reverse = True)
+
+    def record_cutoff(self, move, depth, ply):
+        # a quiet move caused a beta cutoff, remember it as a killer of this ply and raise its history score
+        if (move & CAPTURE_FLAG):
+            return
+        killers = self.killers[ply]
+        if (killers[0] != move):
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move] = min(self.history.get(move, 0) + depth * depth, (1 << 27) - 1)
+
+    def count_node(self):
+        # count a searched position, stop the search when the budget of the move has run out
+        self.nodes += 1
+        if (self.can_stop):
+            if (self.node_limit != None and self.nodes > self.node_limit):
+                raise SearchTimeout
+            if (self.deadline != None and (self.nodes & 1023) == 0 and time.time() >= self.deadline):
+                raise SearchTimeout
+            if (self.stop != None and (self.nodes & 1023) == 0 and self.stop.is_set()):
+                raise SearchTimeout
+
+    def Quiescence(self, board, alpha, beta, maximizingplayer, qdepth):
+        # search captures only, so that the score is not taken in the middle of an exchange
+        # the side to move may also stop capturing and keep the static score (stand pat)
+        # qdepth is how many more captures may be played
+        # return score of the position for this player, positive is good for self.team
+        stand_pat = self.team * self.eval_board(board)
+        if maximizingplayer:
+            if (stand_pat >= beta or qdepth == 0):
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            moves = board.capture_codes(self.team)
+        else:
+            if (stand_pat <= alpha or qdepth == 0):
+                return stand_pat
+            beta = min(beta, stand_pat)
+            moves = board.capture_codes(self.opponent_team)
+
+        bestmove_score = stand_pat
+        for move in sorted(moves, key = lambda m: self.mvv_lva(board, m), reverse = True):
+            # delta pruning: skip captures that cannot bring the score back inside the window
+            if (self.delta_pruning):
+                gain = PIECE_VALUE[abs(board.code_at(move & 255)) - 1] + DELTA_MARGIN
+                if (maximizingplayer and stand_pat + gain <= alpha) or (not maximizingplayer and stand_pat - gain >= beta):
+                    continue
+            self.count_node()
+            board.make_move(move)
+            tempmove_score = self.Quiescence(board, alpha, beta, not maximizingplayer, qdepth - 1)
+            board.unmake_move()
+            if maximizingplayer:
+                bestmove_score = max(bestmove_score, tempmove_score)
+                alpha = max(alpha, tempmove_score)
+            else:
+                bestmove_score = min(bestmove_score, tempmove_score)
+                beta = min(beta, tempmove_score)
+            if beta <= alpha:
+                break
+        return bestmove_score
+
+    def MinimaxAlphaBeta(self, depth, board, alpha, beta, maximizingplayer, ply = 0, allow_null = True):
         # depth is number of moves look ahead 
-        # maximizingplayer is a boolean 
-        # return score for the current move
+        # maximizingplayer is a boolean, True when this player is the one to move
+        # ply is how many moves the position is below the root
+        # allow_null is False right after a null move, so two null moves are never played in a row
+        # return score of the position for this player, positive is good for self.team
+        self.count_node()
+        ply = min(ply, MAX_PLY - 1)
+        self.pv_table[ply] = []
         if (depth == 0):
-            return -self.eval_board(board)
+            if (self.quiescence_depth > 0):
+                return self.Quiescence(board, alpha, beta, maximizingplayer, self.quiescence_depth)
+            return self.team * self.eval_board(board)
+        # moves are packed into integers inside the search, see encode_move
+        if maximizingplayer:
+            moves = board.legal_codes(self.team)
+        else:
+            moves = board.legal_codes(self.opponent_team)
+        if (moves == []):
+            return self.team * self.eval_board(board)
+
+        # look the position up in the transposition table
+        key = board.hash ^ self.side_key
+        alpha_original = alpha
+        beta_original = beta
+        tt_move = 0
+        entry = self.tt.probe(key)
+        if (entry != None):
+            tt_depth, tt_score, tt_bound, tt_move = entry
+            if (tt_depth >= depth):
+                if (tt_bound == EXACT):
+                    return tt_score
+                elif (tt_bound == LOWERBOUND):
+                    alpha = max(alpha, tt_score)
+                elif (tt_bound == UPPERBOUND):
+                    beta = min(beta, tt_score)
+                if beta <= alpha:
+                    return tt_score
+
+        # null move pruning: pass the turn and search with a null window next to the bound of the side to move
+        # if passing already holds the bound, a real move will too (except in zugzwang, hence the piece guard)
+        if (self.null_move and allow_null and ply > 0 and depth > NULL_MOVE_REDUCTION):
+            if maximizingplayer:
+                if (beta < self.MAX and board.piece_count(self.team) >= NULL_MOVE_MIN_PIECES):
+                    board.make_null_move()
+                    null_score = self.MinimaxAlphaBeta(depth - 1 - NULL_MOVE_REDUCTION, board, beta - 1, beta, False, ply + 1, False)
+                    board.unmake_null_move()
+                    if (null_score >= beta):
+                        return null_score
+            else:
+                if (alpha > self.MIN and board.piece_count(self.opponent_team) >= NULL_MOVE_MIN_PIECES):
+                    board.make_null_move()
+                    null_score = self.MinimaxAlphaBeta(depth - 1 - NULL_MOVE_REDUCTION, board, alpha, alpha + 1, True, ply + 1, False)
+                    board.unmake_null_move()
+                    if (null_score <= alpha):
+                        return null_score
+
+        order = self.order_moves(board, moves, tt_move, ply)
+        killers = self.killers[ply]
+
+        # principal variation search: the first move is searched with the whole window,
+        # the others only with a null window to prove they are not better, and again with the whole window if they are
+        # scores are whole numbers, so a window of width 1 is a null window
+        # with lmr, late quiet moves get their null window search one move shallower first
+        best_move = 0
         if maximizingplayer: #initialize to min for maximizing
             bestmove_score = self.MIN 
-            for move in self.moves:
-                # make copy of the board position so we are not changing the actual board when trying moves
-                tempboard = deepcopy(board)
-                tempboard.push(move)
-                tempmove_score = self.MinimaxAlphaBeta(depth - 1, tempboard, alpha, beta, False)
-                #temp.push(temp_best_move)
-                bestmove_score = max(bestmove_score, tempmove_score)
+            for n, move in enumerate(order):
+                reduction = 1 if (self.lmr and n >= LMR_FULL_MOVES and depth >= LMR_MIN_DEPTH and not move & CAPTURE_FLAG
+                                  and move not in killers) else 0
+                # play the move and take it back, so we are not changing the actual board when trying moves
+                board.make_move(move)
+                if (best_move == 0):
+                    tempmove_score = self.MinimaxAlphaBeta(depth - 1, board, alpha, beta, False, ply + 1)
+                else:
+                    tempmove_score = self.MinimaxAlphaBeta(depth - 1 - reduction, board, alpha, alpha + 1, False, ply + 1)
+                    if (reduction and tempmove_score > alpha):
+                        tempmove_score = self.MinimaxAlphaBeta(depth - 1, board, alpha, alpha + 1, False, ply + 1)
+                    if (alpha < tempmove_score < beta):
+                        tempmove_score = self.MinimaxAlphaBeta(depth - 1, board, alpha, beta, False, ply + 1)
+                board.unmake_move()
+                if (tempmove_score > bestmove_score or best_move == 0):
+                    bestmove_score = tempmove_score
+                    best_move = move
+                if (tempmove_score > alpha):
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
                 alpha = max(alpha, tempmove_score) # update alpha
                 if beta <= alpha: # the check condition for pruning the move or not
-                    return bestmove_score # prune, stop checking more moves in the for loop  
+                    self.record_cutoff(move, depth, ply)
+                    break # prune, stop checking more moves in the for loop  
         else: 
             bestmove_score = self.MAX # which is the minimizingplayer, initialize to max for minimizing
-            for move in self.moves:
-                # make copy of the board position so we are not changing the actual board when trying moves
-                tempboard = deepcopy(board)
-                tempboard.push(move)
-                tempmove_score = self.MinimaxAlphaBeta(depth - 1, tempboard, alpha, beta, True)
-                #temp.push(temp_best_move)
-                bestmove_score = min(bestmove_score, tempmove_score)
-                alpha = min(alpha, tempmove_score) # update alpha
+            for n, move in enumerate(order):
+                reduction = 1 if (self.lmr and n >= LMR_FULL_MOVES and depth >= LMR_MIN_DEPTH and not move & CAPTURE_FLAG
+                                  and move not in killers) else 0
+                # play the move and take it back, so we are not changing the actual board when trying moves
+                board.make_move(move)
+                if (best_move == 0):
+                    tempmove_score = self.MinimaxAlphaBeta(depth - 1, board, alpha, beta, True, ply + 1)
+                else:
+                    tempmove_score = self.MinimaxAlphaBeta(depth - 1 - reduction, board, beta - 1, beta, True, ply + 1)
+                    if (reduction and tempmove_score < beta):
+                        tempmove_score = self.MinimaxAlphaBeta(depth - 1, board, beta - 1, beta, True, ply + 1)
+                    if (alpha < tempmove_score < beta):
+                        tempmove_score = self.MinimaxAlphaBeta(depth - 1, board, alpha, beta, True, ply + 1)
+                board.unmake_move()
+                if (tempmove_score < bestmove_score or best_move == 0):
+                    bestmove_score = tempmove_score
+                    best_move = move
+                if (tempmove_score < beta):
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                beta = min(beta, tempmove_score) # update beta
                 if beta <= alpha: # the check condition for pruning the move or not
-                    return bestmove_score # prune, stop checking more moves in the for loop
-    
-    def MinimaxAlphaBetaDriver(self, depth, board):
+                    self.record_cutoff(move, depth, ply)
+                    break # prune, stop checking more moves in the for loop
+
+        if (bestmove_score <= alpha_original):
+            bound = UPPERBOUND
+        elif (bestmove_score >= beta_original):
+            bound = LOWERBOUND
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, bestmove_score, bound, best_move)
+        return bestmove_score
+
+    def search_root_move(self, depth, board, move, alpha, beta):
+        # score of a root move searched depth moves deep, and the line expected to follow it
+        board.make_move(move)
+        score = self.MinimaxAlphaBeta(depth - 1, board, alpha, beta, False, 1)
+        board.unmake_move()
+        return score, [move] + self.pv_table[1]
+
+    def search_root(self, depth, board, root_moves, guess):
+        # search the root moves in order, return a list of [score, move, pv], best first
+        # guess is the best score of the previous iteration, the first move is searched in a small window around it
+        # (an aspiration window), which is opened up on the failing side when the score falls outside
+        # the first top_k moves are searched with the whole window, every later move first with a null window
+        # at the k-th best score so far, and again with the window above that score only if it beats it
+        # so the top_k moves of the result have exact scores, the scores of the others are only upper bounds
+        results = []
+        exact = [] # the top_k best exact scores so far, a heap with the k-th best first
+        for move in root_moves:
+            if (results == [] and guess != None):
+                low, high = guess - self.aspiration_window, guess + self.aspiration_window
+                while True:
+                    score, pv = self.search_root_move(depth, board, move, low, high)
+                    if (score <= low):
+                        low = self.MIN
+                    elif (score >= high):
+                        high = self.MAX
+                    else:
+                        break
+            elif (len(exact) < self.top_k):
+                score, pv = self.search_root_move(depth, board, move, self.MIN, self.MAX)
+            else:
+                kth = exact[0]
+                score, pv = self.search_root_move(depth, board, move, kth, kth + 1)
+                if (score > kth):
+                    score, pv = self.search_root_move(depth, board, move, kth, self.MAX)
+            results.append([score, move, pv])
+            if (len(exact) < self.top_k):
+                heapq.heappush(exact, score)
+            elif (score > exact[0]):
+                heapq.heapreplace(exact, score)
+        results.sort(key = lambda i: i[0], reverse = True) # sort according to score, best first
+        return results
+
+    def MinimaxAlphaBetaDriver(self, depth, board, first_depth = 1):
         # driver function for calling the recursive Minimax Alphabeta
         # depth is how many moves we look ahead in the future
-        bestmove = self.moves[0]
-        best_list = []
-        bestmove_score = self.MIN #initialize worse score to optimize
-        for move in self.moves:
-            # make copy of the board position so we are not changing the actual board when trying moves
-            tempboard = deepcopy(board)
-            tempboard.push(move)
-            tempmove_score = self.MinimaxAlphaBeta(depth - 1, tempboard, self.MAX, self.MIN, False)
-            best_list.append([tempmove_score, move])
-            if (tempmove_score > bestmove_score): 
-                # if the current checked move has better score than the best move on record
-                bestmove_score = tempmove_score # update best score 
-                bestmove = move # update bestmove
+        # iterative deepening: search to depth first_depth, first_depth + 1, ... up to depth, or until the time or node budget runs out
+        # the moves are searched in the order of the previous iteration's scores, best first,
+        # and the transposition table gives each position the best move found one iteration earlier
+        # return the move to play and its principal variation, a list of packed moves starting with it
+        self.side_key = 0 if board.turn == self.team else ZOBRIST_SIDE
+        if (self.nnue is not None and board.nnue is not self.nnue):
+            attach_nnue(board, self.nnue)
+        self.nodes = 0
+        self.deadline = None if self.time_limit == None else time.time() + self.time_limit / 1000
+        self.completed_depth = 0
+        undo_depth = len(board.undo_stack)
+        # killers belong to the previous position, history is kept but counts less than cutoffs of this move
+        self.killers = [[0, 0] for i in range(MAX_PLY)]
+        for move in self.history:
+            self.history[move] //= 2
+        best_list = [[0, move, [move]] for move in map(encode_move, self.moves)]
+        for d in range(first_depth, depth + 1):
+            self.can_stop = (d > first_depth)
+            try:
+                best_list = self.search_root(d, board, [i[1] for i in best_list], None if d == first_depth else best_list[0][0])
+            except SearchTimeout:
+                # the budget ran out in the middle of the iteration, take back the moves still on the board
+                # and keep the result of the last iteration that finished
+                while len(board.undo_stack) > undo_depth:
+                    board.unmake_move()
+                break
+            self.completed_depth = d
+        self.can_stop = False
+        self.root_results = best_list
+        return self.pick_move(best_list)
+
+    def pick_move(self, best_list):
+        # pick the move to play from the [score, move, pv] list of a search, best first
+        # return the move in list format and its principal variation
         # With some probability, we will choose the second or third best move to have more variance on results 
-        best_list.sort() # sort according to score
-        best_list = [i[1] for i in best_list] # convert back to a list of moves
         #print("best_list = ",best_list)
-        bestmove = random.choices(best_list[:3])  # , weights=(70, 20, 10))  
+        candidates = best_list[:self.top_k]
+        if (self.temperature == None or self.completed_depth == 0):
+            weights = None
+        else:
+            weights = [numpy.exp((i[0] - candidates[0][0]) / self.temperature) for i in candidates]
+        bestmove = random.choices(candidates, weights = weights)  # , weights=(70, 20, 10))  
         #print("bestmove",bestmove)
-        return bestmove[0]
+        self.pv = bestmove[0][2]
+        return decode_move(bestmove[0][1]), self.pv
+
+    def LazySMPDriver(self, depth, board):
+        # search with the helper processes, same result format as MinimaxAlphaBetaDriver
+        # helper i searches depths 1 + i % 2, 2 + i % 2, ... up to depth + i % 2, so half of them are always
+        # one iteration ahead and fill the shared table with deeper results for the others
+        # the helpers stop when this process finishes its own search, the deepest finished result is played
+        if (self.helpers == []):
+            self.start_helpers()
+        pieces = [[p[0].team, p[0].type, p[1]] for p in board.allpieces()]
+        self.stop.clear()
+        for i, helper in enumerate(self.helpers):
+            helper[1].put((type(board), pieces, board.turn, depth + i % 2, 1 + i % 2))
+        move, pv = self.MinimaxAlphaBetaDriver(depth, board)
+        self.stop.set()
+        best_depth = self.completed_depth
+        best_list = self.root_results
+        for helper in self.helpers:
+            helper_depth, helper_list = helper[2].get()
+            if (helper_depth > best_depth):
+                best_depth, best_list = helper_depth, helper_list
+        if (best_list is self.root_results):
+            return move, pv
+        self.completed_depth = best_depth
+        self.root_results = best_list
+        return self.pick_move(best_list)
+
+    def start_helpers(self):
+        # start workers - 1 helper processes, each with its own job and result queue
+        self.stop = multiprocessing.Event()
+        settings = {"quiescence_depth": self.quiescence_depth, "top_k": self.top_k, "null_move": self.null_move, "lmr": self.lmr,
+                    "nnue": self.nnue}
+        for i in range(self.workers - 1):
+            jobs = multiprocessing.Queue()
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target = lazy_smp_helper, daemon = True,
+                                              args = (self.team, settings, self.tt, jobs, results, self.stop))
+            process.start()
+            self.helpers.append((process, jobs, results))
+
+    def close(self):
+        # stop the helper processes and free the shared transposition table
+        for process, jobs, results in self.helpers:
+            jobs.put(None)
+        for process, jobs, results in self.helpers:
+            process.join()
+        self.helpers = []
+        if (self.workers > 1):
+            self.tt.close(unlink = True)
 
     def next_move(self, board):
         self.add_move(board)
-        bestmove = self.MinimaxAlphaBetaDriver(self.depth, board)
+        if (self.workers > 1):
+            bestmove, pv = self.LazySMPDriver(self.depth, board)
+        else:
+            bestmove, pv = self.MinimaxAlphaBetaDriver(self.depth, board)
         self.clear_moves()
         return bestmove
 
 
+def lazy_smp_helper(team, settings, tt, jobs, results, stop):
+    # body of a helper process of MinimaxAlphaBeta_Player, searches the positions sent on jobs
+    # a job is (board class, [team, type, [y,x,z]] of every piece, side to move, deepest depth, first depth), None ends the process
+    # puts (depth of the last finished iteration, [score, move, pv] of every root move) on results
+    player = MinimaxAlphaBeta_Player(team, 1, tt_size_mb = 0, **settings)
+    player.tt = tt
+    player.stop = stop
+    while True:
+        job = jobs.get()
+        if (job == None):
+            break
+        board_class, pieces, turn, depth, first_depth = job
+        board = board_class(9, 9, 3)
+        for p in pieces:
+            board.add_piece(p[0], p[1], 0, p[2], False)
+        if (board.turn != turn):
+            board.changeturn()
+        player.add_move(board)
+        player.MinimaxAlphaBetaDriver(depth, board, first_depth)
+        player.clear_moves()
+        results.put((player.completed_depth, player.root_results))
+    tt.close()
+
+
+VALUE_SCALE = 200 # score difference that counts as a clear advantage for the MCTS evaluators (tanh(1) = 0.76)
+VIRTUAL_LOSS = 1 # lost games added to every node on the path of a simulation that waits for its evaluation
+
+## evaluators for MCTS_Player
+# evaluate(board, moves, team) gets a position, the legal packed moves of team, the side to move,
+# and returns (priors, value): a prior probability for every move, and how good the position is for team, from -1 to 1
+# evaluate_batch(positions) does the same for a list of (board, moves, team) and returns a list of (priors, value)
+class HeuristicEvaluator:
+    # uniform priors, the value is the running score of the board squashed to (-1, 1)
+    mirror_symmetric = True # the mirror image has the negated score, see EvalCache
+    def __init__(self, scale = VALUE_SCALE):
+        self.scale = scale
+
+    def evaluate(self, board, moves, team):
+        return uniform_priors(moves), numpy.tanh(team * board.score / self.scale)
+
+    def evaluate_batch(self, positions):
+        return [self.evaluate(board, moves, team) for board, moves, team in positions]
+
+
+class RolloutEvaluator:
+    # uniform priors, the value is the average result of random games played from the position
+    # a game that has no winner after max_plies moves counts by the score of the board, like HeuristicEvaluator
+    def __init__(self, rollouts = 1, max_plies = 40, scale = VALUE_SCALE):
+        self.rollouts = rollouts
+        self.max_plies = max_plies
+        self.scale = scale
+
+    def evaluate(self, board, moves, team):
+        total = 0
+        for r in range(self.rollouts):
+            side = team
+            plies = 0
+            result = None
+            while (plies < self.max_plies):
+                codes = moves if plies == 0 else board.legal_codes(side)
+                if (codes == []):
+                    break
+                board.make_move(random.choice(codes))
+                plies += 1
+                side = -side
+                winner = board.check_winner()
+                if (winner != 0):
+                    result = winner * team
+                    break
+            if (result == None):
+                result = numpy.tanh(team * board.score / self.scale)
+            for i in range(plies):
+                board.unmake_move()
+            total += result
+        return uniform_priors(moves), total / self.rollouts
+
+    def evaluate_batch(self, positions):
+        return [self.evaluate(board, moves, team) for board, moves, team in positions]
+
+
+class KerasEvaluator:
+    # uniform priors, the value comes from a model trained like the one in SL_NN.py:
+    # input BoardToMatrix (see boards_to_matrix), output the probabilities of (draw, white wins, black wins)
+    # the value for white is P(white wins) - P(black wins)
+    # a batch of positions is evaluated with one call to model.predict
+    def __init__(self, model):
+        self.model = model
+
+    def evaluate(self, board, moves, team):
+        return self.evaluate_batch([(board, moves, team)])[0]
+
+    def evaluate_batch(self, positions):
+        output = self.model.predict(boards_to_matrix([p[0] for p in positions]), verbose = 0)
+        return [(uniform_priors(moves), team * white_value(out)) for (board, moves, team), out in zip(positions, output)]
+
+
+class MCTS_Player(Player):
+    """ Monte Carlo tree search player with PUCT selection, as in AlphaZero
+        the tree is kept in flat arrays indexed by node number, the children of a node are numbered next to each other:
+            visits[n]       times node n was visited
+            value_sums[n]   sum of the values backed up through n, for the player who made the move into n
+            priors[n]       prior probability of the move into n, from the evaluator of the parent
+            moves_into[n]   the move into n, packed into an integer
+            parents[n]      node number of the parent, -1 for the root
+            first_child[n]  node number of the first child, children_count[n] children, 0 before n is expanded
+            hashes[n]       position_key of the position at n, 0 until a simulation has reached it
+        evaluator is any object with an evaluate method like HeuristicEvaluator and RolloutEvaluator
+        the budget of a move is simulations, or time_limit in milliseconds when it is set
+        the tree is kept between moves: when the position of the next move is in it (our move and the reply),
+        that node becomes the root with everything searched below it, at most max_reused_nodes of them
+        batch_size > 1 walks down the tree that many times before evaluating, every walk adds a virtual loss to
+        its path so the next ones spread out to other leaves, and all their leaves are evaluated together
+        with one evaluate_batch call (one model.predict for KerasEvaluator)
+    """
+    def __init__(self, team, simulations = 800, time_limit = None, evaluator = None, c_puct = 1.5, temperature = None,
+                 reuse_tree = True, max_reused_nodes = 200000, batch_size = 1):
+        super().__init__(team)
+        self.simulations = simulations
+        self.time_limit = time_limit
+        self.evaluator = HeuristicEvaluator() if evaluator == None else evaluator
+        self.c_puct = c_puct
+        self.MIN = -numpy.inf
+        # None plays the most visited move, otherwise a move is picked with weight visits ** (1 / temperature)
+        self.temperature = temperature
+        self.simulations_done = 0          # simulations of the last move
+        self.simulations_per_second = 0    # speed of the last move
+        self.batch_size = batch_size
+        self.reuse_tree = reuse_tree
+        self.max_reused_nodes = max_reused_nodes
+        self.reused_visits = 0             # visits of the root taken over from the previous move
+        self.new_tree()
+
+    def position_key(self, board):
+        # Zobrist hash of the pieces without the side to move, the side to move of a node follows from its depth
+        return board.hash ^ (ZOBRIST_SIDE if board.turn == -1 else 0)
+
+    def new_tree(self):
+        # an empty tree with only the root, node 0
+        self.visits = array('i', [0])
+        self.value_sums = array('d', [0])
+        self.priors = array('d', [1])
+        self.moves_into = array('i', [0])
+        self.parents = array('i', [-1])
+        self.first_child = array('i', [0])
+        self.children_count = array('i', [0])
+        self.hashes = array('Q', [0])
+
+    def expand(self, node, moves, priors):
+        # add the children of node, one per move
+        self.first_child[node] = len(self.visits)
+        self.children_count[node] = len(moves)
+        k = len(moves)
+        self.visits.extend([0] * k)
+        self.value_sums.extend([0] * k)
+        self.priors.extend(priors)
+        self.moves_into.extend(moves)
+        self.parents.extend([node] * k)
+        self.first_child.extend([0] * k)
+        self.children_count.extend([0] * k)
+        self.hashes.extend([0] * k)
+
+    def select(self, node):
+        # child of node with the highest PUCT score: Q + c_puct * P * sqrt(N(node)) / (1 + N(child))
+        # an unvisited child has Q = 0
+        visits = self.visits
+        value_sums = self.value_sums
+        priors = self.priors
+        c = self.c_puct * numpy.sqrt(visits[node])
+        best = -1
+        best_score = self.MIN
+        for child in range(self.first_child[node], self.first_child[node] + self.children_count[node]):
+            n = visits[child]
+            score = (value_sums[child] / n if n > 0 else 0) + c * priors[child] / (1 + n)
+            if (score > best_score):
+                best_score = score
+                best = child
+        return best
+
+    def descend(self, board):
+        # walk down the tree by PUCT, playing the moves on board, until a node that is not expanded
+        # return the path of node numbers from the root and the side to move at its end
+        node = 0
+        team = self.team
+        path = [0]
+        while (self.children_count[node] > 0):
+            node = self.select(node)
+            board.make_move(self.moves_into[node])
+            team = -team
+            path.append(node)
+            if (self.hashes[node] == 0):
+                self.hashes[node] = self.position_key(board)
+        return path, team
+
+    def leaf_value(self, board, path, team):
+        # value for team of a leaf that needs no evaluator, None when it has to be evaluated
+        # return (value, moves), moves are the legal moves of team when the leaf is to be evaluated
+        winner = board.check_winner()
+        if (winner != 0 and len(path) > 1):
+            return winner * team, [] # the game is over, no need to evaluate
+        moves = board.legal_codes(team)
+        if (moves == []):
+            return numpy.tanh(team * board.score / VALUE_SCALE), []
+        return None, moves
+
+    def backup(self, path, value):
+        # value is for the side to move at the end of path, every node stores it for the player who moved into it
+        for node in reversed(path):
+            value = -value
+            self.visits[node] += 1
+            self.value_sums[node] += value
+
+    def virtual_loss(self, path, sign):
+        # sign = 1 adds a virtual loss to every node on path, -1 takes it away
+        for node in path:
+            self.visits[node] += sign * VIRTUAL_LOSS
+            self.value_sums[node] -= sign * VIRTUAL_LOSS
+
+    def simulate(self, board):
+        # one simulation: walk down the tree by PUCT, expand and evaluate the leaf, back its value up
+        # return the number of simulations done, 1
+        path, team = self.descend(board)
+        value, moves = self.leaf_value(board, path, team)
+        if (value == None):
+            priors, value = self.evaluator.evaluate(board, moves, team)
+            self.expand(path[-1], moves, priors)
+        self.backup(path, value)
+        for i in range(len(path) - 1):
+            board.unmake_move()
+        return 1
+
+    def simulate_batch(self, board):
+        # up to batch_size simulations whose leaves are evaluated together, return the number done
+        # stops early when a walk ends at a leaf that is already waiting for its evaluation
+        waiting = [] # (path, copy of the leaf position, moves, team)
+        leaves = set()
+        done = 0
+        for k in range(self.batch_size):
+            path, team = self.descend(board)
+            if (path[-1] in leaves):
+                for i in range(len(path) - 1):
+                    board.unmake_move()
+                break
+            value, moves = self.leaf_value(board, path, team)
+            if (value == None):
+                waiting.append((path, board.copy_board(), moves, team))
+                leaves.add(path[-1])
+                self.virtual_loss(path, 1)
+            else:
+                self.backup(path, value)
+                done += 1
+            for i in range(len(path) - 1):
+                board.unmake_move()
+        if (waiting != []):
+            results = self.evaluator.evaluate_batch([(leaf, moves, team) for path, leaf, moves, team in waiting])
+            for (path, leaf, moves, team), (priors, value) in zip(waiting, results):
+                self.virtual_loss(path, -1)
+                self.expand(path[-1], moves, priors)
+                self.backup(path, value)
+            done += len(waiting)
+        return done
+
+    def search(self, board):
+        # run simulations from the position until the budget of the move is used up, return the number run
+        # with a simulation budget, the visits the root already has from the previous move count towards it
+        start = time.time()
+        deadline = None if self.time_limit == None else start + self.time_limit / 1000
+        done = 0
+        while True:
+            if (self.batch_size > 1):
+                done += self.simulate_batch(board)
+            else:
+                done += self.simulate(board)
+            if (deadline != None):
+                if (time.time() >= deadline):
+                    break
+            elif (self.visits[0] >= self.simulations):
+                break
+        self.simulations_done = done
+        self.simulations_per_second = done / max(time.time() - start, 1e-9)
+        return done
+
+    def root_children(self):
+        # node numbers of the children of the root
+        return range(self.first_child[0], self.first_child[0] + self.children_count[0])
+
+    def find_position(self, key):
+        # node of the root or of a grandchild of the root (after our move and the reply) with this position_key, -1 if none
+        if (self.hashes[0] == key):
+            return 0
+        for child in self.root_children():
+            for grandchild in range(self.first_child[child], self.first_child[child] + self.children_count[child]):
+                if (self.hashes[grandchild] == key):
+                    return grandchild
+        return -1
+
+    def reroot(self, node):
+        # make node the root and drop the rest of the tree
+        # the nodes below it are copied breadth first, so the children of each node stay next to each other
+        # once max_reused_nodes are copied, the remaining nodes keep their statistics but lose their children
+        old = (self.visits, self.value_sums, self.priors, self.moves_into, self.first_child, self.children_count, self.hashes)
+        visits, value_sums, priors, moves_into, first_child, children_count, hashes = old
+        self.new_tree()
+        self.visits[0] = visits[node]
+        self.value_sums[0] = value_sums[node]
+        self.hashes[0] = hashes[node]
+        queue = [(node, 0)] # old and new node number of the nodes whose children are still to be copied
+        for old_node, new_node in queue:
+            k = children_count[old_node]
+            if (k == 0 or len(self.visits) + k > self.max_reused_nodes):
+                continue
+            first = first_child[old_node]
+            self.expand(new_node, moves_into[first:first + k], priors[first:first + k])
+            new_first = self.first_child[new_node]
+            for i in range(k):
+                self.visits[new_first + i] = visits[first + i]
+                self.value_sums[new_first + i] = value_sums[first + i]
+                self.hashes[new_first + i] = hashes[first + i]
+                if (children_count[first + i] > 0):
+                    queue.append((first + i, new_first + i))
+
+    def next_move(self, board):
+        key = self.position_key(board)
+        node = self.find_position(key) if self.reuse_tree else -1
+        if (node == -1):
+            self.new_tree()
+            self.hashes[0] = key
+        elif (node != 0):
+            self.reroot(node)
+        self.reused_visits = self.visits[0]
+        self.search(board)
+        children = list(self.root_children())
+        if (children == []):
+            print("there are no legal moves")
+            return []
+        if (self.temperature == None):
+            best = max(children, key = lambda child: self.visits[child])
+        else:
+            best = random.choices(children, weights = [self.visits[child] ** (1 / self.temperature) + 1e-9 for child in children])[0]
+        return decode_move(self.moves_into[best])
+
+
 ## GUI class for human player
 class HumanPlayer():
     def __init__(self, team):
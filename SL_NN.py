@@ -8,6 +8,7 @@ from keras.layers import Dense, Flatten
 from keras.optimizers import Adam
 
 from sklearn.model_selection import train_test_split
+from NumpyNN import export_model, verify_model, NumpyModel
 
 """
 # datasets are lists of 18 x 9x9x3 matrices valued 0 or 1
@@ -77,3 +78,8 @@ Model.fit(x_train, y_train, batch_size = batch_size, epochs = epochs, validation
 score = Model.evaluate(x_test, y_test, verbose=0)
 print("Test loss:", score[0])
 print("Test accuracy:", score[1])
+
+# weights for searching without TensorFlow, see NumpyNN.py
+export_model(Model, "SL_value_network.npz")
+difference, matches = verify_model(Model, NumpyModel("SL_value_network.npz"), x_test[:256])
+print("NumPy model largest difference from Keras:", difference, "(ok)" if matches else "(MISMATCH)")
@@ -0,0 +1,152 @@
+from array import array
+from multiprocessing import shared_memory
+
+# bound types of a stored score
+EXACT = 0       # the score is exact
+LOWERBOUND = 1  # the search failed high, the real score is at least this
+UPPERBOUND = 2  # the search failed low, the real score is at most this
+
+class TranspositionTable:
+    """ fixed size table of search results, indexed by the Zobrist hash of a position
+        every bucket has two slots: the first keeps the deepest result seen (depth-preferred),
+        the second takes every other store (always-replace)
+        all storage is allocated up front, so the memory used never grows past size_mb
+    """
+    ENTRY_BYTES = 8 + 8 + 1 + 1 + 4  # key, score, depth, bound, best move
+
+    def __init__(self, size_mb = 16):
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        n = 2 * self.buckets
+        self.keys = array('Q', bytes(8 * n))
+        self.scores = array('d', bytes(8 * n))
+        self.depths = array('b', [-1]) * n   # -1 marks an empty slot
+        self.bounds = array('b', bytes(n))
+        self.moves = array('i', bytes(4 * n)) # best move packed into an integer (see encode_move), 0 for none
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        # forget every stored result
+        n = 2 * self.buckets
+        self.keys = array('Q', bytes(8 * n))
+        self.depths = array('b', [-1]) * n
+        self.moves = array('i', bytes(4 * n))
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        # return (depth, score, bound, move) stored for the position with this hash, None if there is none
+        self.probes += 1
+        i = (key % self.buckets) * 2
+        for slot in (i, i + 1):
+            if (self.keys[slot] == key and self.depths[slot] >= 0):
+                self.hits += 1
+                return (self.depths[slot], self.scores[slot], self.bounds[slot], self.moves[slot])
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        # save a search result, move is the packed best move or 0
+        # the replacement policy of every table, which only differ in read and write
+        i = (key % self.buckets) * 2
+        old_key, old_depth, old_score, old_bound, old_move = self.read(i)
+        if (old_key == key or depth >= old_depth):
+            if (old_key != key and old_depth >= 0):
+                # the old deep entry is not thrown away, it moves to the always-replace slot
+                self.write(i + 1, old_key, old_depth, old_score, old_bound, old_move)
+            self.write(i, key, depth, score, bound, move)
+        else:
+            self.write(i + 1, key, depth, score, bound, move)
+
+    def read(self, slot):
+        # (key, depth, score, bound, move) of a slot, depth -1 when it is empty
+        return self.keys[slot], self.depths[slot], self.scores[slot], self.bounds[slot], self.moves[slot]
+
+    def write(self, slot, key, depth, score, bound, move):
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.scores[slot] = score
+        self.bounds[slot] = bound
+        self.moves[slot] = move
+
+    def hitrate(self):
+        # fraction of probes that found the position
+        if (self.probes == 0):
+            return 0
+        return self.hits / self.probes
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """ transposition table in shared memory, for searching one position with several processes (Lazy SMP)
+        same buckets and replacement (store) as TranspositionTable, but every slot is two 64-bit words:
+        the packed result (data) and key ^ data
+        processes write without locks, a slot torn by two writes at once no longer satisfies
+        key ^ data == first word, so probe treats it as empty instead of returning a wrong result
+        scores are stored as whole numbers
+        name attaches to a table another process created, None creates a new one
+    """
+    ENTRY_BYTES = 8 + 8
+
+    def __init__(self, size_mb = 16, name = None):
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        if (name == None):
+            self.shm = shared_memory.SharedMemory(create = True, size = 2 * self.buckets * self.ENTRY_BYTES)
+            self.shm.buf[:] = bytes(self.shm.size)
+        else:
+            self.shm = shared_memory.SharedMemory(name = name)
+        self.name = self.shm.name
+        self.words = self.shm.buf.cast('Q')
+        self.probes = 0
+        self.hits = 0
+
+    def __getstate__(self):
+        # a process that unpickles the table attaches to the same shared memory
+        return (self.size_mb, self.name)
+
+    def __setstate__(self, state):
+        self.__init__(state[0], state[1])
+
+    def clear(self):
+        # forget every stored result, for every process
+        self.shm.buf[:] = bytes(self.shm.size)
+        self.probes = 0
+        self.hits = 0
+
+    def close(self, unlink = False):
+        # detach from the shared memory, unlink = True also frees it (only the process that created it should)
+        self.words.release()
+        self.shm.close()
+        if (unlink):
+            self.shm.unlink()
+
+    def pack(self, depth, score, bound, move):
+        # score in the low 32 bits, then depth + 1 (0 marks an empty slot), bound and the packed move
+        return (int(score) & 0xFFFFFFFF) | ((depth + 1) << 32) | (bound << 40) | (move << 42)
+
+    def read(self, slot):
+        # (key, depth, score, bound, move) of a slot, key 0 and depth -1 when it is empty or torn
+        data = self.words[2 * slot + 1]
+        key = self.words[2 * slot] ^ data
+        if (data == 0):
+            return 0, -1, 0, 0, 0
+        score = data & 0xFFFFFFFF
+        if (score >= 1 << 31):
+            score -= 1 << 32
+        return key, ((data >> 32) & 255) - 1, score, (data >> 40) & 3, data >> 42
+
+    def probe(self, key):
+        # return (depth, score, bound, move) stored for the position with this hash, None if there is none
+        self.probes += 1
+        i = (key % self.buckets) * 2
+        for slot in (i, i + 1):
+            slot_key, depth, score, bound, move = self.read(slot)
+            if (slot_key == key and depth >= 0):
+                self.hits += 1
+                return (depth, score, bound, move)
+        return None
+
+    def write(self, slot, key, depth, score, bound, move):
+        data = self.pack(depth, score, bound, move)
+        self.words[2 * slot + 1] = data
+        self.words[2 * slot] = key ^ data